@@ -1,5 +1,8 @@
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
 from datetime import datetime
 import sys
 
@@ -30,8 +33,13 @@ if not logger.handlers:
     simple_formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s", datefmt="%H:%M:%S")
     console_handler.setFormatter(simple_formatter)
 
-    # Add handlers to the logger
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    # Callers only enqueue records; a listener thread does the formatting and the (possibly blocking)
+    # stdout/file writes, so a slow stdout consumer (Docker, systemd) can't stall the trading loop.
+    log_queue = queue.Queue(-1)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    listener.start()
+    # Drain whatever is still queued on interpreter exit.
+    atexit.register(listener.stop)
 
     logger.info("Logger configured successfully.")
@@ -1,5 +1,7 @@
 import requests
 import os
+import queue
+import threading
 from src.bot.logger import logger
 
 
@@ -37,7 +39,10 @@ class Notifier:
 
         if not self.enabled:
             return
+        self._post(message)
 
+    def _post(self, message):
+        """Delivers a message to Telegram."""
         url = f"https://api.telegram.org/bot{self.token}/sendMessage"
         payload = {"chat_id": self.chat_id, "text": message, "parse_mode": "Markdown"}
         try:
@@ -73,3 +78,39 @@ class Notifier:
         except Exception as e:
             logger.error(f"Notifier Error: Could not get Telegram updates. {e}")
         return []
+
+
+class QueuedNotifier(Notifier):
+    """
+    Notifier whose Telegram POSTs happen on a background thread.
+
+    send_message still logs locally right away, then only enqueues the message, so a slow or failing
+    Telegram API never stalls the caller. The queue is bounded; messages are dropped (and logged) on overflow.
+    """
+
+    def __init__(self, maxsize=100):
+        self._queue = queue.Queue(maxsize=maxsize)
+        super().__init__()
+        self._worker = threading.Thread(target=self._drain, name="notifier", daemon=True)
+        self._worker.start()
+
+    def _post(self, message):
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            logger.warning("Notifier: Message queue is full. Dropping Telegram message.")
+
+    def _drain(self):
+        while True:
+            message = self._queue.get()
+            if message is None:
+                return
+            Notifier._post(self, message)
+
+    def close(self, timeout=10):
+        """Delivers whatever is still queued (up to `timeout` seconds), then stops the worker."""
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._worker.join(timeout)
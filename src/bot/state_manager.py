@@ -1,8 +1,64 @@
 import json
 import os
+from dataclasses import asdict, dataclass, fields
 from datetime import datetime
 from src.bot.logger import logger
 
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib json fallback writes the same layout and reads either's files.
+    orjson = None
+
+
+def _dump_state(path, state):
+    """
+    Serializes state and atomically replaces `path`. The new contents are synced to disk before the
+    replace, so neither a crash nor a power loss mid-write leaves a torn or empty file.
+    """
+    if orjson is not None:
+        payload = orjson.dumps(state, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+    else:
+        payload = json.dumps(state, indent=2).encode("utf-8")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _load_state(path):
+    with open(path, "rb") as f:
+        payload = f.read()
+    return orjson.loads(payload) if orjson is not None else json.loads(payload)
+
+
+@dataclass(slots=True)
+class OpenPosition:
+    """
+    The bot's single open trade. Starts as the PositionSizer's sized order and gains the entry details
+    the live trader records at ENTER; this is what the position state file holds.
+    """
+
+    symbol: str
+    notional_value_usd: float
+    asset_quantity: float
+    asset_price: float
+    initial_apr: float
+    entry_time: str
+    entry_capital: float = 0.0
+    perp_symbol: str | None = None
+    apr_per_period: float | None = None
+    entry_monotonic: float = 0.0  # Process-local clock; the live trader rebases it on recovery.
+    trade_pnl: float = 0.0
+    state_saved_at: str | None = None
+
+    @classmethod
+    def from_state(cls, state):
+        """Builds a position from a saved state dict, ignoring any keys this version no longer stores."""
+        known = {f.name for f in fields(cls)}
+        return cls(**{key: value for key, value in state.items() if key in known})
+
 
 class StateManager:
     """
@@ -16,11 +72,10 @@ class StateManager:
         logger.info("State Manager initialized.")
 
     def save_position_state(self, open_position):
-        """Saves the details of an open position to the state file."""
+        """Saves an OpenPosition to the state file."""
         try:
-            open_position["state_saved_at"] = datetime.now().isoformat()
-            with open(self.position_state_file, "w") as f:
-                json.dump(open_position, f, indent=4)
+            open_position.state_saved_at = datetime.now().isoformat()
+            _dump_state(self.position_state_file, asdict(open_position))
             logger.info(f"STATE: Successfully saved position state to {self.position_state_file}")
             return True
         except Exception as e:
@@ -28,11 +83,10 @@ class StateManager:
             return False
 
     def load_position_state(self):
-        """Loads a position state from the file if it exists."""
+        """Loads the saved OpenPosition if the state file exists."""
         if os.path.exists(self.position_state_file):
             try:
-                with open(self.position_state_file, "r") as f:
-                    state = json.load(f)
+                state = OpenPosition.from_state(_load_state(self.position_state_file))
                 logger.info(f"STATE: Successfully loaded position state from {self.position_state_file}")
                 return state
             except Exception as e:
@@ -56,8 +110,7 @@ class StateManager:
         """Saves the current capital to the capital file."""
         try:
             state = {"last_known_capital": current_capital, "timestamp": datetime.now().isoformat()}
-            with open(self.capital_file, "w") as f:
-                json.dump(state, f, indent=4)
+            _dump_state(self.capital_file, state)
             # We don't log this every time to avoid spamming the logs.
             return True
         except Exception as e:
@@ -71,11 +124,10 @@ class StateManager:
         """
         if os.path.exists(self.capital_file):
             try:
-                with open(self.capital_file, "r") as f:
-                    state = json.load(f)
-                    capital = state.get("last_known_capital")
-                    logger.info(f"STATE: Successfully loaded last known capital: ${capital:.2f}")
-                    return capital
+                state = _load_state(self.capital_file)
+                capital = state.get("last_known_capital")
+                logger.info(f"STATE: Successfully loaded last known capital: ${capital:.2f}")
+                return capital
             except Exception as e:
                 logger.error(f"STATE ERROR: Failed to load capital file. Reason: {e}")
                 return starting_capital
@@ -1,13 +1,21 @@
 import ccxt
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 import os
 import sys
-from datetime import datetime
+from datetime import datetime, timezone
 from dotenv import load_dotenv
 import argparse
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.data_loader import FLOAT32_COLUMNS
+from src.symbols import perp_symbol_for
+
 # --- Configuration ---
 DEFAULT_START_YEAR = 2018
+OHLCV_TIMEFRAMES = ("1d", "4h", "1h")
 
 
 def create_exchange(use_testnet=False):
@@ -28,25 +36,73 @@ def create_exchange(use_testnet=False):
     return exchange
 
 
+def _to_arrow_table(df):
+    """Converts a collected frame to an Arrow table with epoch-ms timestamps."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    ts_index = table.schema.get_field_index("timestamp")
+    return table.set_column(ts_index, "timestamp", table.column(ts_index).cast(pa.timestamp("ms")))
+
+
+def save_dataset(df, filename):
+    """
+    Saves a collected frame as CSV (for humans and legacy readers) and as a
+    zstd-compressed Parquet file next to it, which is the canonical copy.
+    """
+    pacsv.write_csv(_to_arrow_table(df), filename)
+    save_parquet(df, filename.replace(".csv", ".parquet"))
+
+
+def save_parquet(df, filename):
+    """Writes the canonical zstd Parquet copy of a collected frame, with prices downcast to float32."""
+    df = df.astype({c: "float32" for c in FLOAT32_COLUMNS if c in df.columns})
+    pq.write_table(
+        _to_arrow_table(df),
+        filename,
+        compression="zstd",
+        use_dictionary=False,
+        data_page_size=1 << 20,
+    )
+
+
+def format_ms(timestamp_ms):
+    """Formats an epoch-ms timestamp for progress output without building a pandas Timestamp."""
+    return datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc).strftime("%Y-%m-%d %H:%M")
+
+
+def iter_pages(fetch_page, since, timestamp_of, limit=1000):
+    """
+    Shared paging loop for the exchange's history endpoints.
+
+    Calls fetch_page(since, limit) and yields each non-empty page, advancing
+    `since` past the last timestamp until the exchange returns an empty page.
+    Exceptions are left to the caller, which decides whether to keep partial data.
+    """
+    while True:
+        page = fetch_page(since, limit)
+        if not len(page):
+            return
+        since = timestamp_of(page[-1]) + 1
+        yield page
+
+
 def fetch_ohlcv_data(exchange, symbol, timeframe, start_dt):
-    """Fetches historical OHLCV data from a start date and saves it to a CSV file."""
+    """Fetches historical OHLCV data from a start date and saves it to CSV and Parquet files."""
     print(f"\nFetching {timeframe} OHLCV data for {symbol} from {start_dt.strftime('%Y-%m-%d')}...")
 
     since = int(start_dt.timestamp() * 1000)
     all_ohlcv = []
-    limit = 1000
 
-    while True:
-        try:
-            ohlcv = exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=limit)
-            if not len(ohlcv):
-                break
-            since = ohlcv[-1][0] + 1
+    try:
+        pages = iter_pages(
+            lambda since, limit: exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=limit),
+            since,
+            timestamp_of=lambda bar: bar[0],
+        )
+        for ohlcv in pages:
             all_ohlcv.extend(ohlcv)
-            print(f"  Fetched {len(ohlcv)} bars, continuing from {pd.to_datetime(ohlcv[-1][0], unit='ms')}")
-        except Exception as e:
-            print(f"  An error occurred fetching OHLCV for {symbol}: {e}")
-            break
+            print(f"  Fetched {len(ohlcv)} bars, continuing from {format_ms(ohlcv[-1][0])}")
+    except Exception as e:
+        print(f"  An error occurred fetching OHLCV for {symbol}: {e}")
 
     if not all_ohlcv:
         print(f"No OHLCV data returned for {symbol}.")
@@ -58,31 +114,29 @@ def fetch_ohlcv_data(exchange, symbol, timeframe, start_dt):
 
     safe_symbol_name = symbol.replace("/", "_").replace(":", "_")
     filename = f"data/{safe_symbol_name}_{timeframe}_ohlcv.csv"
-    df.to_csv(filename, index=False)
+    save_dataset(df, filename)
     print(f"Successfully saved OHLCV data to: {filename}")
 
 
 def fetch_funding_rate_history(exchange, symbol, start_dt):
-    """Fetches historical funding rate data from a start date and saves it to a CSV file."""
+    """Fetches historical funding rate data from a start date and saves it to CSV and Parquet files."""
     print(f"\nFetching Funding Rate History for {symbol} from {start_dt.strftime('%Y-%m-%d')}...")
-    perp_symbol = f"{symbol.split('/')[0]}/USDT:USDT"
+    perp_symbol = perp_symbol_for(symbol)
     since = int(start_dt.timestamp() * 1000)
     all_rates = []
-    limit = 1000
 
-    while True:
-        try:
-            rates = exchange.fetch_funding_rate_history(perp_symbol, since=since, limit=limit)
-            if not len(rates):
-                break
-            since = rates[-1]["timestamp"] + 1
+    try:
+        pages = iter_pages(
+            lambda since, limit: exchange.fetch_funding_rate_history(perp_symbol, since=since, limit=limit),
+            since,
+            timestamp_of=lambda rate: rate["timestamp"],
+        )
+        for rates in pages:
             all_rates.extend(rates)
-            print(
-                f"  Fetched {len(rates)} funding rate entries, continuing from {pd.to_datetime(rates[-1]['timestamp'], unit='ms')}"
-            )
-        except ccxt.BaseError as e:
-            print(f"Could not fetch funding rate history for {perp_symbol}. Reason: {e}")
-            return
+            print(f"  Fetched {len(rates)} funding rate entries, continuing from {format_ms(rates[-1]['timestamp'])}")
+    except ccxt.BaseError as e:
+        print(f"Could not fetch funding rate history for {perp_symbol}. Reason: {e}")
+        return
     if not all_rates:
         print(f"No funding rate data returned for {perp_symbol}.")
         return
@@ -92,7 +146,7 @@ def fetch_funding_rate_history(exchange, symbol, start_dt):
     df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms")
     df = df[["timestamp", "fundingRate"]]
     filename = f"data/{symbol.replace('/', '_')}_funding_rates.csv"
-    df.to_csv(filename, index=False)
+    save_dataset(df, filename)
     print(f"Successfully saved Funding Rate data to: {filename}")
 
 
@@ -114,16 +168,11 @@ if __name__ == "__main__":
 
     exchange_instance = create_exchange(use_testnet=args.testnet)
 
-    if args.data_type == "ohlcv":
-        fetch_ohlcv_data(exchange_instance, args.symbol, "1d", start_date)
-        fetch_ohlcv_data(exchange_instance, args.symbol, "4h", start_date)
-        fetch_ohlcv_data(exchange_instance, args.symbol, "1h", start_date)
-    elif args.data_type == "funding":
+    if args.data_type == "funding":
         fetch_funding_rate_history(exchange_instance, args.symbol, start_date)
-    elif args.data_type == "perp_ohlcv":
-        perp_symbol = f"{args.symbol.split('/')[0]}/USDT:USDT"
-        fetch_ohlcv_data(exchange_instance, perp_symbol, "1d", start_date)
-        fetch_ohlcv_data(exchange_instance, perp_symbol, "4h", start_date)
-        fetch_ohlcv_data(exchange_instance, perp_symbol, "1h", start_date)
+    else:
+        ohlcv_symbol = perp_symbol_for(args.symbol) if args.data_type == "perp_ohlcv" else args.symbol
+        for timeframe in OHLCV_TIMEFRAMES:
+            fetch_ohlcv_data(exchange_instance, ohlcv_symbol, timeframe, start_date)
 
     print("\n--- Data Collection Finished ---")
@@ -0,0 +1,41 @@
+import argparse
+import glob
+import os
+import sys
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.collect_data import save_parquet
+
+DATA_PATTERNS = ("data/*_ohlcv.csv", "data/*_funding_rates.csv")
+
+
+def convert_to_parquet(overwrite=False):
+    """
+    One-time migration: writes a Parquet copy next to every collected CSV in data/.
+    CSVs that already have a Parquet copy (collect_data now writes both) are skipped unless overwrite is set.
+    """
+    csv_files = sorted(f for pattern in DATA_PATTERNS for f in glob.glob(pattern))
+    if not csv_files:
+        print("No collected CSV files found in data/.")
+        return
+
+    for csv_file in csv_files:
+        parquet_file = csv_file.replace(".csv", ".parquet")
+        if os.path.exists(parquet_file) and not overwrite:
+            print(f"  - Skipping {csv_file} (Parquet copy exists)")
+            continue
+        df = pd.read_csv(csv_file, parse_dates=["timestamp"])
+        save_parquet(df, parquet_file)
+        print(f"  - Converted {csv_file} -> {parquet_file} ({len(df)} rows)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert collected CSV data files to Parquet")
+    parser.add_argument("--overwrite", action="store_true", help="Rewrite Parquet files that already exist.")
+    args = parser.parse_args()
+
+    print("\n--- Converting data files to Parquet ---")
+    convert_to_parquet(overwrite=args.overwrite)
+    print("\n--- Conversion Finished ---")
@@ -1,10 +1,18 @@
 import time
 import ccxt
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 import os
 import sys
 
 from src.bot.notifier import Notifier
+from src.symbols import perp_symbol_for
+
+# Cached histories are reused for up to 4h, but never across a funding settlement (every 8h at 00/08/16 UTC).
+FUNDING_CACHE_TTL_SECONDS = 4 * 3600
+FUNDING_PERIOD_SECONDS = 8 * 3600
 
 
 class DataFeedManager:
@@ -22,6 +30,11 @@ class DataFeedManager:
         self.max_reconnects = 5
         self.connection_status = "DISCONNECTED"
         self.time_offset = 0  # Difference between local and server time in ms
+        self._cache = {}  # (perp_symbol, limit) -> (fetched_at, history)
+
+        # One pooled keep-alive session for the lifetime of the manager. Reconnects only
+        # re-verify time sync, so sockets stay warm across the backoff gaps.
+        self.exchange.session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=8))
         print("Data Feed Manager initialized.")
 
     def connect(self):
@@ -90,30 +103,53 @@ class DataFeedManager:
     def get_funding_rate_data(self, symbol, limit):
         """
         Primary data fetching method.
+
+        Results are cached per (perp_symbol, limit) for FUNDING_CACHE_TTL_SECONDS, or until the next
+        settlement if that comes first, so repeat calls within a cycle do not hit the network.
         """
         if self.connection_status != "CONNECTED":
             print("Warning: Cannot fetch data, currently disconnected.")
             return None
+        perp_symbol = perp_symbol_for(symbol)
+
+        key = (perp_symbol, limit)
+        fetched_at, cached_history = self._cache.get(key, (0, None))
+        now = time.time()
+        if (
+            now - fetched_at < FUNDING_CACHE_TTL_SECONDS
+            and now // FUNDING_PERIOD_SECONDS == fetched_at // FUNDING_PERIOD_SECONDS
+        ):
+            return cached_history
+
         try:
-            perp_symbol = f"{symbol.split('/')[0]}/USDT:USDT"
             history = self.exchange.fetch_funding_rate_history(perp_symbol, limit=limit)
 
             # Placeholder for future sanity checks
             if not self.validate_funding_rates(history):
                 self.notifier.send_message(f"⚠️ WARNING: Suspicious funding rate detected for {symbol}.")
                 pass
+            self._cache[key] = (now, history)
             return history
-        except Exception as e:
+        except ccxt.NetworkError as e:
+            # Only transport failures (incl. RequestTimeout) warrant the reconnect/backoff cycle.
             print(f"Data Feed Error: Could not fetch data for {symbol}. {e}")
+            if isinstance(e.__cause__, (requests.ConnectionError, requests.Timeout)):
+                # Drop the broken sockets; the session and its adapter are reused on reconnect.
+                self.exchange.session.close()
             self.disconnect()
             return None
+        except Exception as e:
+            # ExchangeError/BadSymbol and malformed payloads won't be fixed by reconnecting.
+            print(f"Data Feed Error: Request for {symbol} failed without a connection problem. {e}")
+            return None
 
     def validate_funding_rates(self, data):
         # This is a simple sanity check, not a full validation yet.
-        for record in data:
-            if abs(float(record["fundingRate"])) > 0.01:  # >1% funding rate is very high
-                print(f"Suspicious Rate Found: {record['fundingRate']}")
-                return False
+        rates = np.fromiter((record["fundingRate"] for record in data), dtype=np.float64, count=len(data))
+        suspicious = np.abs(rates) > 0.01  # >1% funding rate is very high
+        if suspicious.any():
+            print(f"Suspicious Rate Found: {data[int(np.argmax(suspicious))]['fundingRate']}")
+            return False
         return True
 
 
@@ -0,0 +1,26 @@
+import os
+
+import pandas as pd
+
+# The float32 schema of collected OHLCV data: collect_data.save_parquet writes it, and a CSV-only load is
+# downcast to it, so both files read back with the same dtypes. float32 keeps well under 1ppm price precision.
+FLOAT32_COLUMNS = ("open", "high", "low", "close", "volume")
+
+
+def read_timeseries(csv_file):
+    """
+    Reads a collected data file (see collect_data.py) into a frame indexed by timestamp.
+
+    Prefers the Parquet copy next to the CSV, which loads typed and columnar; otherwise the CSV is parsed
+    with the multithreaded PyArrow reader. The index is always nanosecond datetimes and OHLCV
+    columns float32, whichever file was read.
+    Raises FileNotFoundError if neither file exists.
+    """
+    parquet_file = csv_file.replace(".csv", ".parquet")
+    if os.path.exists(parquet_file):
+        df = pd.read_parquet(parquet_file).set_index("timestamp")
+    else:
+        df = pd.read_csv(csv_file, engine="pyarrow", index_col="timestamp", parse_dates=["timestamp"])
+        df = df.astype({c: "float32" for c in FLOAT32_COLUMNS if c in df.columns})
+    df.index = df.index.as_unit("ns")
+    return df
@@ -1,5 +1,14 @@
+import asyncio
 import time
 import uuid
+from collections import OrderedDict
+
+from src.symbols import perp_symbol_for
+
+# Delay between order-status checks while waiting for the perp leg to fill.
+FILL_POLL_INTERVAL_SECONDS = 0.25
+# Most recent order updates kept from the stream. The stream also carries orders nobody waits on, so it is bounded.
+ORDER_CACHE_MAX_ENTRIES = 256
 
 
 class ExecutionHandler:
@@ -10,18 +19,93 @@ class ExecutionHandler:
     It handles the safety-first entry/exit sequence and logs every action.
     """
 
-    def __init__(self, exchange):
+    def __init__(self, exchange, fill_timeout_seconds=10):
         self.exchange = exchange
+        self.fill_timeout_seconds = fill_timeout_seconds
         self.state = "IDLE"  # Can be IDLE, ENTERING, IN_POSITION, EXITING, EMERGENCY_CLOSING
         self.current_position = {}
+        # Local view of order state, fed by the exchange's order stream when it has one.
+        self._orders = OrderedDict()  # order id -> latest order update, oldest first
+        self._fill_events = {}  # order id -> asyncio.Event, set once the order is closed
+        self._stream_task = None
         print("Execution Handler initialized in IDLE state.")
 
     def get_state(self):
         return self.state
 
-    def open_trade(self, sized_order):
+    def _start_order_stream(self):
+        """Starts the background order-stream consumer once, if the exchange supports streaming (ccxt.pro)."""
+        if self._stream_task is None and hasattr(self.exchange, "watch_orders"):
+            self._stream_task = asyncio.create_task(self._consume_order_stream())
+
+    async def _consume_order_stream(self):
+        """Keeps self._orders current from watch_orders and wakes any waiter whose order has closed."""
+        while True:
+            try:
+                updates = await self.exchange.watch_orders()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Execution Warning: Order stream error, resubscribing. {e}")
+                await asyncio.sleep(1)
+                continue
+            for update in updates:
+                self._orders[update["id"]] = update
+                self._orders.move_to_end(update["id"])
+                if update["status"] == "closed":
+                    # Only wake an existing waiter; a close that arrives first is found in the cache instead.
+                    fill_event = self._fill_events.get(update["id"])
+                    if fill_event is not None:
+                        fill_event.set()
+            while len(self._orders) > ORDER_CACHE_MAX_ENTRIES:
+                self._orders.popitem(last=False)
+
+    async def close(self):
+        """Stops the order-stream consumer."""
+        if self._stream_task is not None:
+            self._stream_task.cancel()
+            try:
+                await self._stream_task
+            except asyncio.CancelledError:
+                pass
+            self._stream_task = None
+
+    async def poll_for_fill(self, order_id, timeout_seconds):
+        """
+        Waits until the exchange reports the order as closed (filled).
+        Returns False if it is still open when the timeout expires.
+        With an order stream this is a cache lookup plus an event wait; otherwise it polls over REST.
+        """
+        if self._stream_task is not None:
+            cached = self._orders.get(order_id)
+            if cached is not None and cached["status"] == "closed":
+                filled = True
+            else:
+                fill_event = self._fill_events.setdefault(order_id, asyncio.Event())
+                try:
+                    await asyncio.wait_for(fill_event.wait(), timeout=timeout_seconds)
+                    filled = True
+                except asyncio.TimeoutError:
+                    # The fill may have been pushed before the stream subscribed; confirm over REST before giving up.
+                    order = await self.exchange.fetch_order(order_id)
+                    filled = order["status"] == "closed"
+            self._orders.pop(order_id, None)
+            self._fill_events.pop(order_id, None)
+            return filled
+
+        deadline = time.monotonic() + timeout_seconds
+        while True:
+            order = await self.exchange.fetch_order(order_id)
+            if order["status"] == "closed":
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(FILL_POLL_INTERVAL_SECONDS)
+
+    async def open_trade(self, sized_order):
         """
         Attempts to execute the full, two-legged entry for a trade.
+        Must be awaited; every exchange call is a coroutine so other tasks keep running during network waits.
 
         Args:
             sized_order (dict): A dictionary from the PositionSizer.
@@ -33,14 +117,15 @@ class ExecutionHandler:
         print("\n--- Initiating Trade Entry ---")
         self.state = "ENTERING"
         symbol = sized_order["symbol"]
-        perp_symbol = f"{symbol.split('/')[0]}/USDT:USDT"
+        perp_symbol = perp_symbol_for(symbol)
         quantity = sized_order["asset_quantity"]
+        self._start_order_stream()
 
         # --- Step 1: Place the Perpetual Leg (Limit Order) ---
         print(f"Step 1: Placing PERP LIMIT SELL order for {quantity:.6f} {perp_symbol}.")
         try:
             # For a short, we sell at the best bid price to increase fill probability
-            perp_order_id = self.exchange.create_limit_sell_order(perp_symbol, quantity)
+            perp_order_id = await self.exchange.create_limit_sell_order(perp_symbol, quantity)
             print(f"   - Perp order placed successfully. Order ID: {perp_order_id}")
         except Exception as e:
             print(f"   - FAILED to place perp order: {e}")
@@ -49,13 +134,13 @@ class ExecutionHandler:
 
         # --- Step 2: Poll for the Perpetual Leg Fill ---
         print(f"Step 2: Polling for fill on order {perp_order_id}...")
-        order_filled = self.exchange.poll_for_fill(perp_order_id, timeout_seconds=10)
+        order_filled = await self.poll_for_fill(perp_order_id, timeout_seconds=self.fill_timeout_seconds)
 
         if not order_filled:
             print("   - FAILED: Perp order did not fill within timeout.")
             print("   - Cancelling perp order...")
             # NOTE: In a real system, we'd add logic here to handle a partial fill.
-            self.exchange.cancel_order(perp_order_id)
+            await self.exchange.cancel_order(perp_order_id)
             print("   - Perp order cancelled.")
             self.state = "IDLE"
             return False
@@ -65,7 +150,7 @@ class ExecutionHandler:
         # --- Step 3: Place the Spot Leg (Market Order) ---
         print(f"Step 3: Placing SPOT MARKET BUY order for {quantity:.6f} {symbol}.")
         try:
-            spot_order_id = self.exchange.create_market_buy_order(symbol, quantity)
+            spot_order_id = await self.exchange.create_market_buy_order(symbol, quantity)
             print(f"   - SUCCESS: Spot order placed. Order ID: {spot_order_id}")
         except Exception as e:
             print(f"   - FAILED to place spot order: {e}")
@@ -92,22 +177,29 @@ if __name__ == "__main__":
                 f"MockExchange initialized: Perp will fill={'Yes' if should_perp_fill else 'No'}, Spot will fail={'Yes' if should_spot_fail else 'No'}"
             )
 
-        def create_limit_sell_order(self, symbol, quantity):
+        async def create_limit_sell_order(self, symbol, quantity):
             order_id = str(uuid.uuid4())
-            self.open_orders[order_id] = {"status": "open"}
+            self.open_orders[order_id] = {"id": order_id, "status": "open"}
             return order_id
 
-        def poll_for_fill(self, order_id, timeout_seconds):
+        async def fetch_order(self, order_id):
             if self.should_perp_fill:
                 self.open_orders[order_id]["status"] = "closed"
-                return True
-            return False
+            return self.open_orders[order_id]
+
+        async def watch_orders(self):
+            # Simulates a stream push: the next batch of order updates arrives after a short delay.
+            await asyncio.sleep(0.05)
+            if self.should_perp_fill:
+                for order in self.open_orders.values():
+                    order["status"] = "closed"
+            return list(self.open_orders.values())
 
-        def cancel_order(self, order_id):
+        async def cancel_order(self, order_id):
             self.open_orders.pop(order_id, None)
             return True
 
-        def create_market_buy_order(self, symbol, quantity):
+        async def create_market_buy_order(self, symbol, quantity):
             if self.should_spot_fail:
                 raise Exception("Network error: Unable to reach exchange.")
             return str(uuid.uuid4())
@@ -120,28 +212,34 @@ if __name__ == "__main__":
         "asset_price": 0.15,
     }
 
-    # --- Test Case 1: "Happy Path" - Everything works ---
-    print("\n--- Test Case 1: Happy Path ---")
-    mock_exchange_ok = MockExchange(should_perp_fill=True, should_spot_fail=False)
-    handler_ok = ExecutionHandler(mock_exchange_ok)
-    success_1 = handler_ok.open_trade(dummy_sized_order)
-    assert success_1 is True
-    assert handler_ok.get_state() == "IN_POSITION"
-
-    # --- Test Case 2: Perp order fails to fill ---
-    print("\n--- Test Case 2: Perp order does not fill ---")
-    mock_exchange_perp_fail = MockExchange(should_perp_fill=False, should_spot_fail=False)
-    handler_perp_fail = ExecutionHandler(mock_exchange_perp_fail)
-    success_2 = handler_perp_fail.open_trade(dummy_sized_order)
-    assert success_2 is False
-    assert handler_perp_fail.get_state() == "IDLE"
-
-    # --- Test Case 3: Spot leg fails after perp fills (DANGER) ---
-    print("\n--- Test Case 3: Spot leg fails (CRITICAL) ---")
-    mock_exchange_spot_fail = MockExchange(should_perp_fill=True, should_spot_fail=True)
-    handler_spot_fail = ExecutionHandler(mock_exchange_spot_fail)
-    success_3 = handler_spot_fail.open_trade(dummy_sized_order)
-    assert success_3 is False
-    assert handler_spot_fail.get_state() == "EMERGENCY_CLOSING"
+    async def run_tests():
+        # --- Test Case 1: "Happy Path" - Everything works ---
+        print("\n--- Test Case 1: Happy Path ---")
+        mock_exchange_ok = MockExchange(should_perp_fill=True, should_spot_fail=False)
+        handler_ok = ExecutionHandler(mock_exchange_ok, fill_timeout_seconds=1)
+        success_1 = await handler_ok.open_trade(dummy_sized_order)
+        await handler_ok.close()
+        assert success_1 is True
+        assert handler_ok.get_state() == "IN_POSITION"
+
+        # --- Test Case 2: Perp order fails to fill ---
+        print("\n--- Test Case 2: Perp order does not fill ---")
+        mock_exchange_perp_fail = MockExchange(should_perp_fill=False, should_spot_fail=False)
+        handler_perp_fail = ExecutionHandler(mock_exchange_perp_fail, fill_timeout_seconds=1)
+        success_2 = await handler_perp_fail.open_trade(dummy_sized_order)
+        await handler_perp_fail.close()
+        assert success_2 is False
+        assert handler_perp_fail.get_state() == "IDLE"
+
+        # --- Test Case 3: Spot leg fails after perp fills (DANGER) ---
+        print("\n--- Test Case 3: Spot leg fails (CRITICAL) ---")
+        mock_exchange_spot_fail = MockExchange(should_perp_fill=True, should_spot_fail=True)
+        handler_spot_fail = ExecutionHandler(mock_exchange_spot_fail, fill_timeout_seconds=1)
+        success_3 = await handler_spot_fail.open_trade(dummy_sized_order)
+        await handler_spot_fail.close()
+        assert success_3 is False
+        assert handler_spot_fail.get_state() == "EMERGENCY_CLOSING"
+
+    asyncio.run(run_tests())
 
     print("\n--- All ExecutionHandler tests passed! ---")
@@ -1,11 +1,124 @@
+import functools
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from numba import njit
 
+from .data_loader import read_timeseries
 from .strategy import FundingArbStrategy
 
+# Exit reason codes produced by _simulate (0 means the trade was still open at the end of the data).
+EXIT_REASONS = {1: "APR fell below threshold", 2: "Negative funding rate (Kill Switch)"}
+
+# --- Configuration for PnL Calculation ---
+ROUND_TRIP_FEES = 0.001 * 4
+ROUND_TRIP_SLIPPAGE = 0.0005 * 2
+# Numba freezes module globals at compile time, so this is an immediate constant inside _simulate.
+RT_COST = ROUND_TRIP_FEES + ROUND_TRIP_SLIPPAGE
+
+
+@njit(cache=True)
+def _simulate(apr, funding_rates, rolling_apr, entry_thr, exit_thr, initial_capital, deploy_pct, leverage):
+    """
+    Compiled state machine behind run_funding_arb_backtest.
+    Returns the equity curve plus fixed-size trade arrays, of which the first n_trades entries are filled.
+    """
+    n = len(apr)
+    equity_curve = np.empty(n)
+    entry_idx = np.empty(n, dtype=np.int64)
+    exit_idx = np.full(n, -1, dtype=np.int64)
+    exit_code = np.zeros(n, dtype=np.int64)
+    net_pnl = np.zeros(n)
+    n_trades = 0
+
+    # Only bars where an entry or an exit could fire can change state; everything in between just carries
+    # equity forward (and accrues funding while in a position), so walk those candidate bars only.
+    entry_mask = (apr > entry_thr) & (rolling_apr > entry_thr)
+    exit_mask = (apr < exit_thr) | (funding_rates < 0)
+    candidates = np.flatnonzero(entry_mask | exit_mask)
+
+    equity = initial_capital
+    in_position = False
+    notional_value = 0.0
+    entry_k = 0
+    filled_to = 0
+
+    for k in candidates:
+        equity_curve[filled_to:k] = equity
+
+        # --- Handle PnL and Exit Conditions for Open Position ---
+        # Exit Condition 1: APR fell below the profit-taking threshold (Normal Exit)
+        # Exit Condition 2: Funding rate turned negative (Risk Management Exit / Kill Switch)
+        if in_position and exit_mask[k]:
+            gross_pnl = 0.0
+            for j in range(entry_k + 1, k + 1):
+                gross_pnl += notional_value * funding_rates[j]
+
+            pnl = gross_pnl - notional_value * RT_COST
+            equity += pnl
+            exit_idx[n_trades - 1] = k
+            exit_code[n_trades - 1] = 1 if apr[k] < exit_thr else 2
+            net_pnl[n_trades - 1] = pnl
+            in_position = False
+
+        # --- Check for Entry Signal ---
+        if not in_position and entry_mask[k]:
+            notional_value = equity * deploy_pct * leverage
+            entry_k = k
+            entry_idx[n_trades] = k
+            n_trades += 1
+            in_position = True
+
+        equity_curve[k] = equity
+        filled_to = k + 1
+
+    equity_curve[filled_to:] = equity
+
+    return equity_curve, entry_idx, exit_idx, exit_code, net_pnl, n_trades
+
+
+@functools.lru_cache(maxsize=128)
+def _data_paths(symbol):
+    """Returns the (1h OHLCV, funding rates) CSV paths for a symbol."""
+    safe_symbol = symbol.replace("/", "_")
+    return f"data/{safe_symbol}_1h_ohlcv.csv", f"data/{safe_symbol}_funding_rates.csv"
+
+
+@functools.lru_cache(maxsize=64)
+def _load_prepared(symbol, start_year):
+    """
+    Loads, resamples and aligns the price/funding data for a symbol once per (symbol, start_year).
+    Returns plain arrays (index, apr, fundingRate) so no DataFrames stay alive in the cache.
+    Raises FileNotFoundError if a data file is missing (failures are not cached).
+    """
+    ohlcv_file, funding_file = _data_paths(symbol)
+    df_ohlcv = read_timeseries(ohlcv_file)
+    df_funding = read_timeseries(funding_file)
+
+    df_ohlcv_8h = df_ohlcv["close"].resample("8H").last().ffill()
+    df = pd.concat([df_ohlcv_8h, df_funding], axis=1).dropna()
+    df = df[df.index.year >= start_year]
+    apr = (df["fundingRate"] * 3 * 365) * 100
+
+    arrays = (df.index.to_numpy(), apr.to_numpy(), df["fundingRate"].to_numpy())
+    for arr in arrays:
+        arr.flags.writeable = False
+    return arrays
+
+
+@functools.lru_cache(maxsize=256)
+def _rolling_apr(symbol, start_year, periods):
+    """Rolling mean of the APR series for the regime filter, cached per filter length."""
+    _, apr, _ = _load_prepared(symbol, start_year)
+    rolling = np.full(len(apr), np.nan)
+    if len(apr) >= periods:
+        # Equivalent to Series.rolling(periods).mean(), without building a Series for each filter length.
+        rolling[periods - 1 :] = np.convolve(apr, np.ones(periods) / periods, mode="valid")
+    rolling.flags.writeable = False
+    return rolling
+
 
 def run_funding_arb_backtest(
     symbol,
@@ -35,26 +148,15 @@ def run_funding_arb_backtest(
             f"Params: entry_apr={entry_apr_threshold}%, exit_apr={exit_apr_threshold}%, filter_periods={regime_filter_periods}"
         )
 
-    # --- Load & Align Data ---
+    # --- Load & Align Data (cached across calls, e.g. an optimizer sweep) ---
     try:
-        ohlcv_file = f"data/{symbol.replace('/', '_')}_1h_ohlcv.csv"
-        funding_file = f"data/{symbol.replace('/', '_')}_funding_rates.csv"
-        df_ohlcv = pd.read_csv(ohlcv_file, index_col="timestamp", parse_dates=True)
-        df_funding = pd.read_csv(funding_file, index_col="timestamp", parse_dates=True)
+        index, apr, funding_rates = _load_prepared(symbol, start_year)
     except FileNotFoundError as e:
         print(f"ERROR: Missing data file: {e}")
         return {"error": str(e)}
 
-    df_ohlcv_8h = df_ohlcv["close"].resample("8H").last().ffill()
-    df = pd.concat([df_ohlcv_8h, df_funding], axis=1).dropna()
-    df = df[df.index.year >= start_year]
-    df["apr"] = (df["fundingRate"] * 3 * 365) * 100
-    df["rolling_apr_avg"] = df["apr"].rolling(window=regime_filter_periods).mean()
-    df.dropna(inplace=True)
-
-    # --- Configuration for PnL Calculation ---
-    ROUND_TRIP_FEES = 0.001 * 4
-    ROUND_TRIP_SLIPPAGE = 0.0005 * 2
+    rolling_apr = _rolling_apr(symbol, start_year, regime_filter_periods)
+    valid = ~np.isnan(rolling_apr)
 
     # Use the same sizing logic as the live bot
     if initial_capital < 300:
@@ -65,72 +167,49 @@ def run_funding_arb_backtest(
         capital_to_deploy_pct = 0.8
 
     # --- Corrected Simulation Loop ---
-    equity = initial_capital
-    equity_curve = []
-    trades = []
-    in_position = False
-    current_trade = {}
-
-    for i, row in df.iterrows():
-        # --- Handle PnL and Exit Conditions for Open Position ---
-        if in_position:
-            # PnL calculation is correct; it handles negative rates automatically.
-            funding_pnl = current_trade["notional_value"] * row["fundingRate"]
-            current_trade["gross_pnl"] += funding_pnl
-            current_trade["funding_payments_received"] += 1
-
-            # Exit Condition 1: APR fell below the profit-taking threshold (Normal Exit)
-            if row["apr"] < exit_apr_threshold:
-                costs = current_trade["notional_value"] * (ROUND_TRIP_FEES + ROUND_TRIP_SLIPPAGE)
-                net_pnl = current_trade["gross_pnl"] - costs
-                equity += net_pnl
-                current_trade.update({"exit_date": i, "net_pnl": net_pnl, "exit_reason": "APR fell below threshold"})
-                in_position = False
-                current_trade = {}
-
-            # Exit Condition 2: Funding rate turned negative (Risk Management Exit)
-            elif row["fundingRate"] < 0:
-                costs = current_trade["notional_value"] * (ROUND_TRIP_FEES + ROUND_TRIP_SLIPPAGE)
-                net_pnl = current_trade["gross_pnl"] - costs
-                equity += net_pnl
-                current_trade.update(
-                    {"exit_date": i, "net_pnl": net_pnl, "exit_reason": "Negative funding rate (Kill Switch)"}
-                )
-                in_position = False
-                current_trade = {}
-            # --- END OF KILL SWITCH LOGIC ---
-
-        # --- Check for Entry Signal ---
-        if not in_position and row["apr"] > entry_apr_threshold and row["rolling_apr_avg"] > entry_apr_threshold:
-            notional_value = equity * capital_to_deploy_pct * leverage
-            current_trade = {
-                "entry_date": i,
-                "notional_value": notional_value,
-                "gross_pnl": 0.0,
-                "funding_payments_received": 0,
-            }
-            trades.append(current_trade)
-            in_position = True
-
-        equity_curve.append({"timestamp": i, "equity": equity})
+    # The loop itself is JIT-compiled; the optimizers call this across whole parameter grids.
+    timestamps = pd.DatetimeIndex(index[valid])
+    equity_curve, entry_idx, exit_idx, exit_code, net_pnl, n_trades = _simulate(
+        apr[valid],
+        funding_rates[valid],
+        rolling_apr[valid],
+        float(entry_apr_threshold),
+        float(exit_apr_threshold),
+        float(initial_capital),
+        capital_to_deploy_pct,
+        float(leverage),
+    )
+    # Trades stay in the kernel's compact arrays (first n_trades entries, exit reasons as EXIT_REASONS codes);
+    # no per-trade Python objects are built since reporting only needs the count.
 
     # --- Performance Reporting ---
-    if not trades:
+    if n_trades == 0:
         print("No trades were executed during this backtest period.")
         return {"Net Profit": 0, "Sharpe Ratio": 0, "Max Drawdown (%)": 0, "Total Trades": 0}
 
-    equity_df = pd.DataFrame(equity_curve).set_index("timestamp")
-    net_profit = equity_df["equity"].iloc[-1] - initial_capital
+    net_profit = equity_curve[-1] - initial_capital
     total_return = (net_profit / initial_capital) * 100
-    daily_returns = equity_df["equity"].resample("D").last().pct_change().dropna()
-    sharpe_ratio = (daily_returns.mean() / daily_returns.std()) * np.sqrt(365) if daily_returns.std() > 0 else 0
-    running_max = equity_df["equity"].cummax()
-    drawdown = (equity_df["equity"] - running_max) / running_max
+
+    # Daily returns straight from the arrays: the last equity of each calendar day, with days that have
+    # no bars carrying the previous day's value forward (same as resample("D").last().pct_change()).
+    days = timestamps.values.astype("datetime64[D]")
+    last_of_day = np.flatnonzero(np.r_[days[1:] != days[:-1], True])
+    day_offsets = (days[last_of_day] - days[0]).astype(np.int64)
+    daily_equity = equity_curve[last_of_day][np.searchsorted(day_offsets, np.arange(day_offsets[-1] + 1), "right") - 1]
+    daily_returns = np.diff(daily_equity) / daily_equity[:-1]
+    returns_std = daily_returns.std(ddof=1) if len(daily_returns) > 1 else 0
+    sharpe_ratio = (daily_returns.mean() / returns_std) * np.sqrt(365) if returns_std > 0 else 0
+
+    running_max = np.maximum.accumulate(equity_curve)
+    drawdown = (equity_curve - running_max) / running_max
     max_drawdown = abs(drawdown.min()) * 100
 
     if show_plot:
+        # Imported lazily: grid searches and worker processes never plot and shouldn't pay for matplotlib.
+        import matplotlib.pyplot as plt
+
         plt.figure(figsize=(15, 7))
-        equity_df["equity"].plot(label="Equity Curve")
+        pd.Series(equity_curve, index=timestamps).plot(label="Equity Curve")
         plt.title(f"Upgraded Backtest: {symbol} (Sharpe: {sharpe_ratio:.2f})")
         plt.xlabel("Date")
         plt.ylabel("Portfolio Value ($)")
@@ -143,10 +222,29 @@ def run_funding_arb_backtest(
         "Total Return (%)": total_return,
         "Sharpe Ratio": sharpe_ratio,
         "Max Drawdown (%)": max_drawdown,
-        "Total Trades": len(trades),
+        "Total Trades": n_trades,
     }
 
 
+def _run_grid_case(case):
+    symbol, start_year, params = case
+    return run_funding_arb_backtest(symbol, start_year, {symbol: params}, show_plot=False, verbose=False)
+
+
+def run_grid(cases, max_workers=None):
+    """
+    Runs many (symbol, start_year, params) backtests across worker processes.
+
+    The simulation is CPU-bound and independent per parameter set, so this scales with cores.
+    Results are yielded lazily in the same order as `cases`. Each worker keeps its own
+    prepared-data cache and reuses the on-disk Numba cache, so cases are handed out in chunks.
+    """
+    cases = list(cases)
+    workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(_run_grid_case, cases, chunksize=max(1, len(cases) // (workers * 4)))
+
+
 if __name__ == "__main__":
     import warnings
 
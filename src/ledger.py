@@ -1,6 +1,9 @@
-import pandas as pd
+import atexit
+import csv
 import os
 import datetime
+from dataclasses import asdict, is_dataclass
+from src.bot.logger import logger
 
 
 class PaperTradingLedger:
@@ -21,31 +24,46 @@ class PaperTradingLedger:
         if not os.path.exists("data"):
             os.makedirs("data")
 
-        if os.path.exists(self.filename):
-            print(f"Loading existing ledger: {self.filename}")
-        else:
+        is_new = not os.path.exists(self.filename)
+        if is_new:
             print(f"Creating new ledger: {self.filename}")
-            df = pd.DataFrame(columns=self.columns)
-            df.to_csv(self.filename, index=False)
+        else:
+            print(f"Loading existing ledger: {self.filename}")
+
+        # One long-lived, buffered append handle for the whole session: each trade is a single O(1) write,
+        # never a rewrite of the history. The bot closes it from main()'s finally block.
+        self._fh = open(self.filename, "a", newline="", buffering=8192)
+        self._writer = csv.DictWriter(self._fh, fieldnames=self.columns, extrasaction="ignore", lineterminator="\n")
+        if is_new:
+            self._writer.writeheader()
+            self._fh.flush()
+        atexit.register(self.close)
 
     def log_trade(self, action, trade_data, current_equity):
         """
         Logs a trade entry (ENTER or EXIT) to the CSV ledger.
+        `trade_data` is a trade dict or an OpenPosition.
         """
-        with open(self.filename, "a+", newline="") as f:
-            entry = {
-                "timestamp": datetime.datetime.now().isoformat(),
-                "symbol": trade_data.get("symbol", "N/A"),
-                "action": action,
-                "notional_usd": trade_data.get("notional_value_usd", 0.0),
-                "entry_apr": trade_data.get("entry_apr", 0.0),
-                "exit_apr": trade_data.get("exit_apr", 0.0),
-                "current_apr": trade_data.get("current_apr", 0.0),
-                "trade_pnl": trade_data.get("trade_pnl", 0.0),
-                "total_equity": current_equity,
-            }
-            # Create a DataFrame to ensure the columns are written in the correct order
-            df = pd.DataFrame([entry], columns=self.columns)
-            df.to_csv(f, header=False, index=False)
-
-        print(f"LEDGER: Logged {action} for {entry['symbol']}. Equity: ${current_equity:.2f}")
+        if is_dataclass(trade_data):
+            trade_data = asdict(trade_data)
+        entry = {
+            "timestamp": datetime.datetime.now().isoformat(),
+            "symbol": trade_data.get("symbol", "N/A"),
+            "action": action,
+            "notional_usd": trade_data.get("notional_value_usd", 0.0),
+            "entry_apr": trade_data.get("entry_apr", 0.0),
+            "exit_apr": trade_data.get("exit_apr", 0.0),
+            "current_apr": trade_data.get("current_apr", 0.0),
+            "trade_pnl": trade_data.get("trade_pnl", 0.0),
+            "total_equity": current_equity,
+        }
+        self._writer.writerow(entry)
+        # Flush so a crash never loses a logged trade.
+        self._fh.flush()
+
+        logger.info(f"LEDGER: Logged {action} for {entry['symbol']}. Equity: ${current_equity:.2f}")
+
+    def close(self):
+        """Closes the ledger file. Safe to call more than once."""
+        if not self._fh.closed:
+            self._fh.close()
@@ -1,19 +1,25 @@
+import asyncio
 import ccxt
+import ccxt.pro as ccxtpro
+from requests.adapters import HTTPAdapter
 import time
 from dotenv import load_dotenv
 import os
+import signal
 import sys
+import threading
 import datetime
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from src.strategy import FundingArbStrategy
+from src.strategy import FundingArbStrategy, get_funding_rates_snapshot
 from src.position_sizer import select_and_size_position
 from src.risk_manager import RiskManager
 from src.ledger import PaperTradingLedger
-from src.bot.notifier import Notifier
-from src.bot.state_manager import StateManager
+from src.bot.notifier import QueuedNotifier
+from src.bot.state_manager import OpenPosition, StateManager
 from src.bot.logger import logger
+from src.symbols import perp_symbol_for
 
 # --- Configuration ---
 LOOP_INTERVAL_SECONDS = 60
@@ -21,9 +27,14 @@ STARTING_CAPITAL_USD = 100.0
 ROUND_TRIP_FEES = 0.001 * 4
 ROUND_TRIP_SLIPPAGE = 0.0005 * 2
 FUNDING_PERIOD_HOURS = 8
+HEARTBEAT_INTERVAL_SECONDS = 86400
+FUNDING_PERIOD_SECONDS = FUNDING_PERIOD_HOURS * 3600
+POST_FUNDING_WAKEUP_SECONDS = 30
+CAPITAL_SAVE_INTERVAL_SECONDS = 900
+PERIODIC_CHECK_INTERVAL_SECONDS = 900
 
 
-def create_exchange(use_testnet=True):
+def create_exchange(use_testnet=True, preload_markets=True):
     load_dotenv()
     config = {"enableRateLimit": True, "options": {"defaultType": "future"}}
     if use_testnet:
@@ -37,29 +48,129 @@ def create_exchange(use_testnet=True):
         exchange.set_sandbox_mode(True)
     else:
         exchange = ccxt.binance(config)
+
+    # One keep-alive pool for every REST call made through this instance, so TLS handshakes are paid once
+    # rather than per request.
+    exchange.session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+    if not preload_markets:
+        return exchange
+    try:
+        # Load markets up front so the first funding/ticker call in the loop doesn't pay for it.
+        exchange.load_markets()
+    except Exception as e:
+        logger.warning("Could not preload markets; they will load on first use. Reason: %s", e)
     return exchange
 
 
-def main():
+def create_stream_exchange(use_testnet=True):
+    """ccxt.pro client for public WebSocket market streams (no API keys needed)."""
+    exchange = ccxtpro.binance({"options": {"defaultType": "future"}})
+    if use_testnet:
+        exchange.set_sandbox_mode(True)
+    return exchange
+
+
+async def funding_watcher(stream_exchange, perp_symbol, latest_rates):
+    """
+    Keeps latest_rates[perp_symbol] current from Binance's mark-price stream, which carries the
+    live funding rate ('r'), so exit checks read memory instead of polling fetch_funding_rate.
+    """
+    while True:
+        try:
+            ticker = await stream_exchange.watch_mark_price(perp_symbol)
+            latest_rates[perp_symbol] = float(ticker["info"]["r"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Drop the stale value so exit checks fall back to REST until the stream recovers.
+            latest_rates.pop(perp_symbol, None)
+            logger.warning("Funding stream error for %s: %s. Resubscribing...", perp_symbol, e)
+            await asyncio.sleep(5)
+
+
+def apr_per_funding_period(apr):
+    """Converts an annualized APR (%) into the fractional return of a single funding payment."""
+    return (apr / 100) / (365 * (24 / FUNDING_PERIOD_HOURS))
+
+
+def compute_next_wait(is_in_position, awaiting_settlement=False, now=None):
+    """
+    Seconds to wait before the next loop iteration.
+    In a position we check for exits every LOOP_INTERVAL_SECONDS. When idle, entry signals only move
+    with funding settlements (00/08/16 UTC), so sleep until shortly after the next one. If the last scan
+    didn't see the latest settlement yet (the exchange publishes it with a lag), keep polling until it does.
+    """
+    if is_in_position or awaiting_settlement:
+        return LOOP_INTERVAL_SECONDS
+    now = time.time() if now is None else now
+    until_funding = FUNDING_PERIOD_SECONDS - (now % FUNDING_PERIOD_SECONDS)
+    return until_funding + POST_FUNDING_WAKEUP_SECONDS
+
+
+def start_monitor(risk_manager, exchange_ok, stop_event):
+    """
+    Runs the memory and exchange-status checks on a daemon thread every PERIODIC_CHECK_INTERVAL_SECONDS,
+    so their REST round-trip never blocks the trading loop. The loop just reads the exchange_ok flag.
+    """
+
+    def monitor():
+        while not stop_event.is_set():
+            logger.info("Performing periodic checks (Memory, Exchange Status)...")
+            risk_manager.check_memory_usage()
+            if risk_manager.check_exchange_status():
+                exchange_ok.set()
+            else:
+                exchange_ok.clear()
+            stop_event.wait(PERIODIC_CHECK_INTERVAL_SECONDS)
+
+    thread = threading.Thread(target=monitor, name="periodic-checks", daemon=True)
+    thread.start()
+    return thread
+
+
+async def wait_for_shutdown(shutdown_event, timeout):
+    """Sleeps up to `timeout` seconds, returning early if a shutdown is requested."""
+    try:
+        await asyncio.wait_for(shutdown_event.wait(), timeout=timeout)
+    except asyncio.TimeoutError:
+        pass
+
+
+async def heartbeat(notifier, describe_state):
+    """Sends the daily alive message from its own task, independent of the trading loop's cadence."""
+    while True:
+        await asyncio.sleep(HEARTBEAT_INTERVAL_SECONDS)
+        notifier.send_message(f"❤️ BOT ALIVE.\n{describe_state()}")
+
+
+async def main():
     load_dotenv()
     logger.info("--- Initializing Project Chimera: Live Paper Trader (V3.6) ---")
 
     # Initialize Core Components
-    notifier = Notifier()
+    notifier = QueuedNotifier()
     exchange = create_exchange(use_testnet=True)
+    # The exchange-status check runs on the monitor thread, which gets its own client so it never shares the
+    # trading loop's session and rate-limiter state across threads.
+    monitor_exchange = create_exchange(use_testnet=True, preload_markets=False)
+    stream_exchange = create_stream_exchange(use_testnet=True)
     state_manager = StateManager()
 
     current_capital = state_manager.load_capital(STARTING_CAPITAL_USD)
 
-    risk_manager = RiskManager(exchange, current_capital, notifier)
+    risk_manager = RiskManager(monitor_exchange, current_capital, notifier)
     strategy = FundingArbStrategy(exchange)
     ledger = PaperTradingLedger()
 
     is_in_position = False
-    open_position = {}
+    open_position = None
+    # Rebuilt only when a position opens or closes; the heartbeat and loop-start log just read it.
+    state_str = "IDLE"
+    latest_funding_rates = {}
+    funding_task = None
 
-    last_heartbeat_time = time.time()
-    last_periodic_check = time.time()
+    last_saved_capital = None
+    last_save_time = 0.0
 
     # --- STATE RECOVERY LOGIC  ---
     recovered_state = state_manager.load_position_state()
@@ -67,123 +178,182 @@ def main():
         logger.info("!!! RECOVERED POSITION STATE DETECTED !!!")
         open_position = recovered_state
         is_in_position = True
-        logger.info(f"  - Capital from file: ${current_capital:.2f}")
-        logger.info(f"  - Entry capital from recovered position: ${open_position.get('entry_capital', 0.0):.2f}")
-        notifier.send_message(
-            f"🤖 **Project Chimera** RESTARTED & RECOVERED open position for {open_position.get('symbol')}."
-        )
+        state_str = f"IN_POSITION with {open_position.symbol}"
+        # The monotonic clock restarts with the process, so rebase the saved entry onto this run's clock once.
+        elapsed = datetime.datetime.now() - datetime.datetime.fromisoformat(open_position.entry_time)
+        open_position.entry_monotonic = time.monotonic() - elapsed.total_seconds()
+        # State files saved before these were stored on the position won't have them.
+        if open_position.perp_symbol is None:
+            open_position.perp_symbol = perp_symbol_for(open_position.symbol)
+        if open_position.apr_per_period is None:
+            open_position.apr_per_period = apr_per_funding_period(open_position.initial_apr)
+        logger.info("  - Capital from file: $%.2f", current_capital)
+        logger.info("  - Entry capital from recovered position: $%.2f", open_position.entry_capital)
+        notifier.send_message(f"🤖 **Project Chimera** RESTARTED & RECOVERED open position for {open_position.symbol}.")
     else:
         notifier.send_message("🤖 **Project Chimera (V3.6)** Paper Trader INITIALIZED.")
 
-    while True:
-        logger.info("\n----------------------------------")
-        logger.info(
-            f"Loop start. State: {'IN_POSITION' if is_in_position else 'IDLE'}. Capital: ${current_capital:.2f}"
+    # Ctrl+C / SIGTERM wake the loop out of its wait and let it shut down cleanly.
+    # signal.signal (rather than loop.add_signal_handler) keeps this working on Windows.
+    shutdown_event = asyncio.Event()
+    monitor_stop = threading.Event()
+    exchange_ok = threading.Event()
+    exchange_ok.set()  # Assume OK until the monitor's first check says otherwise.
+    start_monitor(risk_manager, exchange_ok, monitor_stop)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, getattr(signal, "SIGTERM", None)):
+        if sig is not None:
+            signal.signal(sig, lambda *_: loop.call_soon_threadsafe(shutdown_event.set))
+
+    # Late-bound closure: always reports the loop's current capital and position.
+    heartbeat_task = asyncio.create_task(
+        heartbeat(
+            notifier,
+            lambda: f"Capital: ${current_capital:.2f}\nState: {state_str}",
         )
-
-        try:
-            # --- Capital and System Checks (Unchanged) ---
-            if not risk_manager.check_capital(current_capital):
-                logger.critical("Capital risk check failed. Shutting down.")
-                break
-
-            if time.time() - last_periodic_check > 900:
-                logger.info("Performing periodic checks (Memory, Exchange Status)...")
-                risk_manager.check_memory_usage()
-                if not risk_manager.check_exchange_status():
+    )
+
+    try:
+        while not shutdown_event.is_set():
+            # One wall-clock read per iteration, so every time comparison in the loop sees the same instant.
+            now = time.time()
+            logger.info("\n----------------------------------")
+            logger.info("Loop start. State: %s. Capital: $%.2f", state_str, current_capital)
+
+            try:
+                # --- Capital and System Checks (Unchanged) ---
+                if not risk_manager.check_capital(current_capital):
+                    logger.critical("Capital risk check failed. Shutting down.")
+                    break
+
+                if not exchange_ok.is_set():
                     logger.warning("Exchange status is not OK. Skipping trading logic for this loop.")
-                    last_periodic_check = time.time()
-                    time.sleep(LOOP_INTERVAL_SECONDS)
+                    await wait_for_shutdown(shutdown_event, LOOP_INTERVAL_SECONDS)
                     continue
-                last_periodic_check = time.time()
-
-            if time.time() - last_heartbeat_time > 86400:
-                heartbeat_msg = (
-                    f"❤️ BOT ALIVE.\n"
-                    f"Capital: ${current_capital:.2f}\n"
-                    f"State: {'IN_POSITION with ' + open_position.get('symbol', '') if is_in_position else 'IDLE'}"
-                )
-                notifier.send_message(heartbeat_msg)
-                last_heartbeat_time = time.time()
-
-            # --- ENTRY LOGIC (Unchanged) ---
-            if not is_in_position:
-                signals = strategy.check_entry_signals(current_capital)
-                if signals:
-                    sized_order = select_and_size_position(signals, current_capital, exchange)
-                    if sized_order:
-                        log_message = (
-                            f"📈 PAPER ENTRY:\n"
-                            f"Symbol: {sized_order['symbol']}\n"
-                            f"Notional: ${sized_order['notional_value_usd']:.2f}"
-                        )
-                        logger.info(log_message)
-                        notifier.send_message(log_message)
 
-                        is_in_position = True
-                        open_position = sized_order
-                        open_position["entry_time"] = datetime.datetime.now().isoformat()
-                        open_position["entry_capital"] = current_capital
-                        ledger.log_trade("ENTER", open_position, current_capital)
-                        state_manager.save_position_state(open_position)
-            else:
-                logger.info(f"Managing open position for {open_position['symbol']}. Monitoring for exit signal...")
-                # =================================================================
-
-                if strategy.check_exit_signal(open_position):
-                    # 1. Get accurate entry and exit details
-                    entry_time = datetime.datetime.fromisoformat(open_position["entry_time"])
-                    exit_time = datetime.datetime.now()
-                    holding_duration = exit_time - entry_time
-                    holding_time_str = str(holding_duration).split(".")[0]
-                    entry_capital = open_position["entry_capital"]
-                    notional_value = open_position["notional_value_usd"]
-
-                    # 2. Determine how many funding payments were received
-                    # This is a robust way to count the number of 8-hour periods crossed
-                    num_funding_events = holding_duration.total_seconds() // (FUNDING_PERIOD_HOURS * 3600)
-
-                    # 3. Estimate total GROSS funding PnL
-                    initial_apr = open_position.get("initial_apr", 0.0)
-                    apr_per_period = (initial_apr / 100) / (365 * (24 / FUNDING_PERIOD_HOURS))
-                    gross_funding_pnl = notional_value * apr_per_period * num_funding_events
-
-                    # 4. Calculate total round-trip costs
-                    trade_costs = notional_value * (ROUND_TRIP_FEES + ROUND_TRIP_SLIPPAGE)
-
-                    # 5. Calculate Final Net PnL and New Capital
-                    net_pnl = gross_funding_pnl - trade_costs
-                    # THIS is the only place capital should be updated for a trade.
-                    current_capital = entry_capital + net_pnl
-
-                    log_message = (
-                        f"📉 PAPER EXIT:\n"
-                        f"Symbol: {open_position['symbol']}\n"
-                        f"Net PnL: ${net_pnl:.4f}\n"
-                        f"  (Gross Funding: ${gross_funding_pnl:.4f} | Costs: ${trade_costs:.4f})\n"
-                        f"Held for: {holding_time_str} ({int(num_funding_events)} funding payments)"
-                    )
-                    logger.info(log_message)
-                    notifier.send_message(log_message)
-
-                    open_position["trade_pnl"] = net_pnl
-                    ledger.log_trade("EXIT", open_position, current_capital)
-                    state_manager.clear_position_state()
-
-                    is_in_position = False
-                    open_position = {}
+                # --- ENTRY LOGIC (Unchanged) ---
+                if not is_in_position:
+                    # The history requests are blocking REST calls, so the whole scan runs off the event loop to keep
+                    # the funding stream flowing meanwhile.
+                    signals = await asyncio.to_thread(strategy.check_entry_signals, current_capital)
+                    if signals:
+                        sized_order = await asyncio.to_thread(
+                            select_and_size_position, signals, current_capital, exchange
+                        )
+                        if sized_order:
+                            log_message = (
+                                f"📈 PAPER ENTRY:\n"
+                                f"Symbol: {sized_order['symbol']}\n"
+                                f"Notional: ${sized_order['notional_value_usd']:.2f}"
+                            )
+                            logger.info(log_message)
+                            # Queued; the notifier sends Telegram POSTs from its own thread.
+                            notifier.send_message(log_message)
+
+                            is_in_position = True
+                            open_position = OpenPosition(
+                                **sized_order,
+                                entry_time=datetime.datetime.now().isoformat(),
+                                entry_monotonic=time.monotonic(),
+                                # Fixed for the life of the trade, so derive them once here.
+                                perp_symbol=perp_symbol_for(sized_order["symbol"]),
+                                apr_per_period=apr_per_funding_period(sized_order["initial_apr"]),
+                                entry_capital=current_capital,
+                            )
+                            state_str = f"IN_POSITION with {open_position.symbol}"
+                            # Ledger writes block, so they run on a worker thread to keep the event loop responsive.
+                            await asyncio.to_thread(ledger.log_trade, "ENTER", open_position, current_capital)
+                            state_manager.save_position_state(open_position)
+                else:
+                    logger.info("Managing open position for %s. Monitoring for exit signal...", open_position.symbol)
                     # =================================================================
+                    perp_symbol = open_position.perp_symbol
+                    if funding_task is None:
+                        funding_task = asyncio.create_task(
+                            funding_watcher(stream_exchange, perp_symbol, latest_funding_rates)
+                        )
 
-        except Exception as e:
-            logger.critical(f"CRITICAL ERROR in main loop: {e}", exc_info=True)
-            notifier.send_message(f"🚨 CRITICAL ERROR in main loop: {e}")
+                    # The stream is None until its first update; until then use the bulk snapshot (at most
+                    # SNAPSHOT_TTL_SECONDS old). If that fails too, check_exit_signal falls back to REST itself.
+                    # Both may block on the network, so like the entry scan they run off the event loop.
+                    current_funding_rate = latest_funding_rates.get(perp_symbol)
+                    if current_funding_rate is None:
+                        try:
+                            rates = await asyncio.to_thread(get_funding_rates_snapshot, exchange)
+                            current_funding_rate = rates.get(perp_symbol, {}).get("fundingRate")
+                        except Exception as e:
+                            logger.warning("Could not fetch funding rate snapshot. Reason: %s", e)
+                    if await asyncio.to_thread(strategy.check_exit_signal, open_position, current_funding_rate):
+                        # 1. Get accurate entry and exit details
+                        # Monotonic, so wall-clock jumps can't skew the funding-event count.
+                        holding_seconds = time.monotonic() - open_position.entry_monotonic
+                        holding_time_str = str(datetime.timedelta(seconds=int(holding_seconds)))
+                        entry_capital = open_position.entry_capital
+                        notional_value = open_position.notional_value_usd
+
+                        # 2. Determine how many funding payments were received
+                        # This is a robust way to count the number of 8-hour periods crossed
+                        num_funding_events = holding_seconds // (FUNDING_PERIOD_HOURS * 3600)
+
+                        # 3. Estimate total GROSS funding PnL
+                        gross_funding_pnl = notional_value * open_position.apr_per_period * num_funding_events
+
+                        # 4. Calculate total round-trip costs
+                        trade_costs = notional_value * (ROUND_TRIP_FEES + ROUND_TRIP_SLIPPAGE)
+
+                        # 5. Calculate Final Net PnL and New Capital
+                        net_pnl = gross_funding_pnl - trade_costs
+                        # THIS is the only place capital should be updated for a trade.
+                        current_capital = entry_capital + net_pnl
 
-        # --- Capital Persistence (Unchanged) ---
-        state_manager.save_capital(current_capital)
+                        log_message = (
+                            f"📉 PAPER EXIT:\n"
+                            f"Symbol: {open_position.symbol}\n"
+                            f"Net PnL: ${net_pnl:.4f}\n"
+                            f"  (Gross Funding: ${gross_funding_pnl:.4f} | Costs: ${trade_costs:.4f})\n"
+                            f"Held for: {holding_time_str} ({int(num_funding_events)} funding payments)"
+                        )
+                        logger.info(log_message)
+                        notifier.send_message(log_message)
 
-        logger.info(f"Loop finished. Sleeping for {LOOP_INTERVAL_SECONDS} seconds...")
-        time.sleep(LOOP_INTERVAL_SECONDS)
+                        open_position.trade_pnl = net_pnl
+                        await asyncio.to_thread(ledger.log_trade, "EXIT", open_position, current_capital)
+                        state_manager.clear_position_state()
+
+                        is_in_position = False
+                        open_position = None
+                        state_str = "IDLE"
+                        funding_task.cancel()
+                        funding_task = None
+                        latest_funding_rates.clear()
+                        # =================================================================
+
+            except Exception as e:
+                logger.critical("CRITICAL ERROR in main loop: %s", e, exc_info=True)
+                notifier.send_message(f"🚨 CRITICAL ERROR in main loop: {e}")
+
+            # --- Capital Persistence ---
+            # Only write when capital changed, plus a periodic refresh; idle loops otherwise rewrite the same value.
+            if current_capital != last_saved_capital or now - last_save_time > CAPITAL_SAVE_INTERVAL_SECONDS:
+                state_manager.save_capital(current_capital)
+                last_saved_capital = current_capital
+                last_save_time = now
+
+            next_wait = compute_next_wait(is_in_position, strategy.awaiting_settlement)
+            logger.info("Loop finished. Sleeping for %.0f seconds...", next_wait)
+            await wait_for_shutdown(shutdown_event, next_wait)
+    finally:
+        # Runs on shutdown, on a capital-risk stop, and on unexpected errors alike.
+        logger.info("Main loop stopped. Shutting down.")
+        monitor_stop.set()
+        risk_manager.close()
+        notifier.close()
+        heartbeat_task.cancel()
+        if funding_task is not None:
+            funding_task.cancel()
+        await stream_exchange.close()
+        ledger.close()
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
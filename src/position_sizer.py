@@ -28,8 +28,8 @@ def select_and_size_position(signals, current_capital_usd, exchange):
         return None
 
     # --- 1. Prioritize Signals ---
-    # Select the single best opportunity by sorting by the highest current APR.
-    best_signal = sorted(signals, key=lambda x: x["current_apr"], reverse=True)[0]
+    # Select the single best opportunity: the highest current APR.
+    best_signal = max(signals, key=lambda x: x["current_apr"])
     print(f"Position Sizer: Best signal found is {best_signal['symbol']} with APR {best_signal['current_apr']:.2f}%.")
 
     # --- 2. Apply Progressive Sizing Logic ---
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+FOMC_DATES = [
+    "2022-01-26",
+    "2022-03-16",
+    "2022-05-04",
+    "2022-06-15",
+    "2022-07-27",
+    "2022-09-21",
+    "2022-11-02",
+    "2022-12-14",
+    "2023-02-01",
+    "2023-03-22",
+    "2023-05-03",
+    "2023-06-14",
+    "2023-07-26",
+    "2023-09-20",
+    "2023-11-01",
+    "2023-12-13",
+    "2024-01-31",
+    "2024-03-20",
+    "2024-05-01",
+    "2024-06-12",
+    "2024-07-31",
+    "2024-09-18",
+    "2024-11-07",
+    "2024-12-18",
+]
+# Parsed once, so the per-bar FOMC flag is a datetime membership test rather than a strftime per bar.
+FOMC_DAYS = pd.DatetimeIndex(FOMC_DATES)
+
+# Share of otherwise valid entries that are randomly not taken (missed fills).
+SIGNAL_SKIP_PROBABILITY = 0.05
+
+# Exit reason codes produced by the backtesters' _simulate kernels.
+EXIT_REASONS = {1: "Stop Loss", 2: "Take Profit"}
+
+
+def fomc_flags(index):
+    """True for every bar of a DatetimeIndex that falls on an FOMC day."""
+    return index.normalize().isin(FOMC_DAYS)
+
+
+def true_range(high, low, close):
+    """Per-bar true range over plain arrays (NaN-free: the first bar has no previous close)."""
+    prev_close = np.empty_like(close)
+    prev_close[0], prev_close[1:] = np.nan, close[:-1]
+    # fmax ignores the missing previous close on the first bar, like DataFrame.max(axis=1) did.
+    return np.fmax.reduce([high - low, np.abs(high - prev_close), np.abs(low - prev_close)])
+
+
+def skip_mask(n, seed):
+    """Which of n bars drop an otherwise valid entry (missed fill); seeded, so a rerun skips the same bars."""
+    return np.random.default_rng(seed).random(n) < SIGNAL_SKIP_PROBABILITY
@@ -1,4 +1,5 @@
-import ccxt
+import asyncio
+import ccxt.async_support as ccxt
 import pandas as pd
 
 # --- Configuration ---
@@ -22,15 +23,14 @@ SYMBOL_UNIVERSE = [
 ]
 
 
-def scan_funding_rates():
-    """
-    Scans for funding rate arbitrage opportunities on Binance perpetual futures.
-    Fetches the current funding rate for a universe of symbols, calculates the
-    annualized return, and prints a sorted table of the best opportunities.
+async def fetch_all_funding_rates():
     """
-    print("--- Starting Funding Rate Scanner ---")
-    print(f"Scanning {len(SYMBOL_UNIVERSE)} symbols on Binance...\n")
+    Returns every symbol's funding rate data in SYMBOL_UNIVERSE order.
+    A symbol that could not be fetched yields an exception in place of the rate data.
 
+    All perpetuals are fetched in a single premiumIndex request; only if that fails are the
+    symbols requested individually (concurrently).
+    """
     exchange = ccxt.binance(
         {
             "enableRateLimit": True,
@@ -39,46 +39,72 @@ def scan_funding_rates():
             },
         }
     )
+    # Construct the perpetual contract symbols in the format CCXT expects
+    # for USD-M futures. e.g., 'BTC/USDT:USDT'
+    perp_symbols = [f"{symbol}/USDT:USDT" for symbol in SYMBOL_UNIVERSE]
+    try:
+        try:
+            all_rates = await exchange.fetch_funding_rates()
+            return [
+                all_rates.get(perp, ccxt.BadSymbol(f"{perp} is not listed in the funding rates response"))
+                for perp in perp_symbols
+            ]
+        except ccxt.DDoSProtection as e:
+            # Retrying symbol by symbol would only make the throttling worse.
+            return [e] * len(perp_symbols)
+        except ccxt.BaseError as e:
+            print(f"Notice: Batched funding rate request failed ({e}). Falling back to per-symbol requests.")
 
-    opportunities = []
+        requests = [exchange.fetch_funding_rate(perp) for perp in perp_symbols]
+        return await asyncio.gather(*requests, return_exceptions=True)
+    finally:
+        await exchange.close()
 
-    for symbol in SYMBOL_UNIVERSE:
-        try:
-            # Construct the perpetual contract symbol in the format CCXT expects
-            # for USD-M futures. e.g., 'BTC/USDT:USDT'
-            perp_symbol = f"{symbol}/USDT:USDT"
-
-            # Fetch the funding rate data
-            rate_data = exchange.fetch_funding_rate(perp_symbol)
-
-            funding_rate = rate_data.get("fundingRate")
-            mark_price = rate_data.get("markPrice")
-
-            if funding_rate is None or mark_price is None:
-                print(f"Warning: Incomplete data for {symbol}. Skipping.")
-                continue
-
-            # Funding is typically paid 3 times a day (every 8 hours)
-            # Calculate projected APR
-            daily_rate = funding_rate * 3
-            apr = daily_rate * 365 * 100  # As a percentage
-
-            opportunities.append(
-                {
-                    "Symbol": symbol,
-                    "Mark Price": f"${mark_price:,.2f}",
-                    "Funding Rate (%)": f"{funding_rate * 100:.4f}%",
-                    "Projected APR (%)": f"{apr:.2f}%",
-                }
-            )
 
-        except ccxt.DDoSProtection as e:
-            print(f"API Rate Limit Error: {e}. Aborting.")
+def scan_funding_rates():
+    """
+    Scans for funding rate arbitrage opportunities on Binance perpetual futures.
+    Fetches the current funding rate for a universe of symbols, calculates the
+    annualized return, and prints a sorted table of the best opportunities.
+    """
+    print("--- Starting Funding Rate Scanner ---")
+    print(f"Scanning {len(SYMBOL_UNIVERSE)} symbols on Binance...\n")
+
+    results = asyncio.run(fetch_all_funding_rates())
+
+    opportunities = []
+
+    for symbol, rate_data in zip(SYMBOL_UNIVERSE, results):
+        if isinstance(rate_data, ccxt.DDoSProtection):
+            print(f"API Rate Limit Error: {rate_data}. Aborting.")
             break
-        except ccxt.BaseError as e:
+        if isinstance(rate_data, ccxt.BaseError):
             # Catch other potential CCXT errors (e.g., symbol not found)
-            print(f"Notice: Could not fetch data for {symbol}. Reason: {e}")
+            print(f"Notice: Could not fetch data for {symbol}. Reason: {rate_data}")
             continue
+        if isinstance(rate_data, BaseException):
+            raise rate_data
+
+        funding_rate = rate_data.get("fundingRate")
+        mark_price = rate_data.get("markPrice")
+
+        if funding_rate is None or mark_price is None:
+            print(f"Warning: Incomplete data for {symbol}. Skipping.")
+            continue
+
+        # Funding is typically paid 3 times a day (every 8 hours)
+        # Calculate projected APR
+        daily_rate = funding_rate * 3
+        apr = daily_rate * 365 * 100  # As a percentage
+
+        opportunities.append(
+            {
+                "Symbol": symbol,
+                "Mark Price": f"${mark_price:,.2f}",
+                "Funding Rate (%)": f"{funding_rate * 100:.4f}%",
+                "Projected APR (%)": f"{apr:.2f}%",
+            }
+        )
 
     if not opportunities:
         print("\n--- No opportunities found or an error occurred. ---")
@@ -1,10 +1,13 @@
 import pandas as pd
 import numpy as np
-import random
 import os
 import sys
 import matplotlib.pyplot as plt
 import datetime
+from numba import njit
+
+from ..data_loader import read_timeseries
+from .backtest_common import EXIT_REASONS, fomc_flags, skip_mask, true_range
 
 TIMEFRAME_CONFIG = {
     "1d": {
@@ -40,36 +43,160 @@ RISK_CONFIG = {
 }
 
 
+@njit(cache=True)
+def _find_exit(low, high, stop, take, start):
+    """First bar at or after `start` where the stop or the take-profit is touched (len(low) if never)."""
+    for k in range(start, len(low)):
+        if low[k] <= stop or high[k] >= take:
+            return k
+    return len(low)
+
+
+@njit(cache=True)
+def _simulate(
+    low,
+    high,
+    close,
+    atr,
+    signals,
+    skip,
+    size_pct,
+    stop_pct,
+    take_pct,
+    start_capital,
+    spread,
+    slippage,
+    fee_rate,
+    max_positions,
+):
+    """
+    Compiled bar loop behind MultiFrameBacktester.run_backtest.
+
+    `signals` is a (timeframe, bar) bool matrix in priority order (1d, 4h, 1h) and each timeframe holds at
+    most one position. Closed trades are written to the t_* arrays in the order they close; the slot arrays
+    hold whatever is still open at the end.
+
+    Stops and take-profits are fixed at entry, so each position's exit bar is found with one forward scan
+    when it opens. The loop then only visits bars with a signal or a scheduled exit and carries equity
+    forward across the rest.
+    """
+    n = len(close)
+    n_tf = signals.shape[0]
+    equity = np.empty(n)
+
+    is_open = np.zeros(n_tf, dtype=np.bool_)
+    slot_entry = np.zeros(n_tf, dtype=np.int64)
+    slot_exit = np.full(n_tf, n, dtype=np.int64)
+    slot_price = np.zeros(n_tf)
+    slot_size = np.zeros(n_tf)
+    slot_stop = np.zeros(n_tf)
+    slot_take = np.zeros(n_tf)
+    slot_notional = np.zeros(n_tf)
+    open_order = np.zeros(n_tf, dtype=np.int64)  # open slots, oldest first
+    n_open = 0
+
+    t_tf = np.empty(n, dtype=np.int64)
+    t_entry = np.empty(n, dtype=np.int64)
+    t_exit = np.empty(n, dtype=np.int64)
+    t_entry_price = np.empty(n)
+    t_exit_price = np.empty(n)
+    t_size = np.empty(n)
+    t_stop = np.empty(n)
+    t_take = np.empty(n)
+    t_notional = np.empty(n)
+    t_pnl = np.empty(n)
+    t_reason = np.empty(n, dtype=np.int64)
+    n_trades = 0
+
+    signal_bars = np.flatnonzero(signals.sum(axis=0) > 0)
+    next_signal = 0
+    filled_to = 0
+    capital = start_capital
+    while True:
+        k = signal_bars[next_signal] if next_signal < len(signal_bars) else n
+        for j in range(n_open):
+            k = min(k, slot_exit[open_order[j]])
+        if k >= n:
+            break
+        equity[filled_to:k] = capital
+
+        # --- Exits due on this bar, in the order the positions were opened ---
+        kept = 0
+        for j in range(n_open):
+            s = open_order[j]
+            if slot_exit[s] != k:
+                open_order[kept] = s
+                kept += 1
+                continue
+
+            if low[k] <= slot_stop[s]:
+                reason = 1
+                atr_pct = atr[k] / slot_stop[s]
+                volatility_slippage = slippage * (1 + atr_pct * 5)
+                exit_price = slot_stop[s] * (1 - spread - slippage - volatility_slippage)
+            else:
+                reason = 2
+                exit_price = slot_take[s] * (1 - spread - slippage)
+
+            pnl = (exit_price - slot_price[s]) * slot_size[s]
+            total_fees = (slot_price[s] * slot_size[s] + exit_price * slot_size[s]) * fee_rate
+            net_pnl = pnl - total_fees
+            capital += net_pnl
+            is_open[s] = False
+
+            t_tf[n_trades] = s
+            t_entry[n_trades] = slot_entry[s]
+            t_exit[n_trades] = k
+            t_entry_price[n_trades] = slot_price[s]
+            t_exit_price[n_trades] = exit_price
+            t_size[n_trades] = slot_size[s]
+            t_stop[n_trades] = slot_stop[s]
+            t_take[n_trades] = slot_take[s]
+            t_notional[n_trades] = slot_notional[s]
+            t_pnl[n_trades] = net_pnl
+            t_reason[n_trades] = reason
+            n_trades += 1
+        n_open = kept
+
+        # --- Entry: the highest-priority timeframe with a signal and a free slot ---
+        if next_signal < len(signal_bars) and signal_bars[next_signal] == k:
+            next_signal += 1
+            chosen = -1
+            for s in range(n_tf):
+                if signals[s, k] and not is_open[s] and n_open < max_positions:
+                    chosen = s
+                    break
+            if chosen >= 0 and not skip[k]:
+                entry_price = close[k] * (1 + spread + slippage)
+                position_size_usd = capital * (size_pct[chosen] / 100.0)
+                is_open[chosen] = True
+                slot_entry[chosen] = k
+                slot_price[chosen] = entry_price
+                slot_size[chosen] = position_size_usd / entry_price
+                slot_stop[chosen] = entry_price * (1 - stop_pct[chosen])
+                slot_take[chosen] = entry_price * (1 + take_pct[chosen])
+                slot_exit[chosen] = _find_exit(low, high, slot_stop[chosen], slot_take[chosen], k + 1)
+                slot_notional[chosen] = position_size_usd
+                open_order[n_open] = chosen
+                n_open += 1
+
+        equity[k] = capital
+        filled_to = k + 1
+
+    equity[filled_to:] = capital
+
+    return (
+        equity,
+        (t_tf, t_entry, t_exit, t_entry_price, t_exit_price, t_size, t_stop, t_take, t_notional, t_pnl, t_reason),
+        n_trades,
+        (is_open, slot_entry, slot_price, slot_size, slot_stop, slot_take, slot_notional),
+    )
+
+
 class MultiFrameBacktester:
-    FOMC_DATES = [
-        "2022-01-26",
-        "2022-03-16",
-        "2022-05-04",
-        "2022-06-15",
-        "2022-07-27",
-        "2022-09-21",
-        "2022-11-02",
-        "2022-12-14",
-        "2023-02-01",
-        "2023-03-22",
-        "2023-05-03",
-        "2023-06-14",
-        "2023-07-26",
-        "2023-09-20",
-        "2023-11-01",
-        "2023-12-13",
-        "2024-01-31",
-        "2024-03-20",
-        "2024-05-01",
-        "2024-06-12",
-        "2024-07-31",
-        "2024-09-18",
-        "2024-11-07",
-        "2024-12-18",
-    ]
-
-    def __init__(self, symbol, data, start_capital=100.0):
+    def __init__(self, symbol, data, start_capital=100.0, seed=42):
         self.symbol = symbol
+        self.seed = seed  # seeds the missed-fill skips, so a rerun reproduces the same trades
         self.data = data
         self.capital = start_capital
         self.equity_curve, self.trades, self.open_positions = [], [], {}
@@ -83,11 +210,13 @@ class MultiFrameBacktester:
 
         aligned_df = self.data["1h"].copy()
 
+        # Each 1h bar takes the latest 4h/1d bar at or before it (a backward as-of join); both indexes are
+        # sorted, so a forward-fill reindex onto the 1h index does this in one linear pass.
+        # Columns are written straight into the 1h frame under their suffixed names, without a renamed copy.
         for tf in ["4h", "1d"]:
-            tf_data_renamed = self.data[tf].rename(columns=lambda c: f"{c}_{tf}")
-            aligned_df = pd.merge_asof(
-                aligned_df, tf_data_renamed, left_index=True, right_index=True, direction="backward"
-            )
+            tf_df = self.data[tf]
+            for col in tf_df.columns:
+                aligned_df[f"{col}_{tf}"] = tf_df[col].reindex(aligned_df.index, method="ffill").to_numpy()
 
         aligned_df.dropna(inplace=True)
         print("Data alignment complete.")
@@ -96,130 +225,113 @@ class MultiFrameBacktester:
     def _calculate_indicators(self, df, config):
 
         df[f'sma_{config["sma_period"]}'] = df["close"].rolling(window=config["sma_period"]).mean()
-        delta = df["close"].diff()
-        gain = delta.where(delta > 0, 0).rolling(window=config["rsi_period"]).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=config["rsi_period"]).mean()
+        # Wilder's RSI: gains and losses smoothed with alpha = 1/period (not a simple rolling mean).
+        delta = np.diff(df["close"].to_numpy(), prepend=np.nan)
+        smoothing = {"alpha": 1 / config["rsi_period"], "adjust": False, "min_periods": config["rsi_period"]}
+        gain = pd.Series(np.where(delta > 0, delta, 0.0), index=df.index).ewm(**smoothing).mean()
+        loss = pd.Series(np.where(delta < 0, -delta, 0.0), index=df.index).ewm(**smoothing).mean()
         df["rsi"] = 100 - (100 / (1 + (gain / loss)))
         df[f"volume_sma_20"] = df["volume"].rolling(window=20).mean()
-        tr_df = pd.DataFrame(
-            {
-                "hl": df["high"] - df["low"],
-                "hc": np.abs(df["high"] - df["close"].shift()),
-                "lc": np.abs(df["low"] - df["close"].shift()),
-            }
-        )
-        df["atr_14"] = tr_df.max(axis=1).rolling(window=14).mean()
+        tr = true_range(df["high"].to_numpy(), df["low"].to_numpy(), df["close"].to_numpy())
+        df["atr_14"] = pd.Series(tr, index=df.index).rolling(window=14).mean()
         df["candle_extended"] = (df["close"] - df["open"]) / df["open"] > 0.05
         df["volatility_high"] = (df["atr_14"] / df["close"]) > 0.03
-        df["is_fomc"] = df.index.strftime("%Y-%m-%d").isin(self.FOMC_DATES)
-
-    def _check_signal(self, row, tf, config):
-        suffix = f"_{tf}" if tf != "1h" else ""
-        if f"{self.symbol}_{tf}" in self.open_positions:
-            return None
-
-        # Construct the column names correctly based on the suffix
-        close_col = f"close{suffix}"
-        sma_col = f'sma_{config["sma_period"]}{suffix}'
-        rsi_col = f"rsi{suffix}"
-        candle_col = f"candle_extended{suffix}"
-        vol_col = f"volatility_high{suffix}"
-        fomc_col = f"is_fomc{suffix}"
-        volume_col = f"volume{suffix}"
-        volume_sma_col = f"volume_sma_20{suffix}"
-
-        if row[candle_col] or row[vol_col] or row[fomc_col]:
-            return None
-
-        if row[close_col] > row[sma_col] and row[rsi_col] < config["rsi_entry_max"]:
-            if row[volume_col] > row[volume_sma_col]:
-                return "BUY"
-        return None
-
-    def _resolve_signals(self, signals):
-        if signals.get("1d") == "SELL":
-            return []
-        for tf in ["1d", "4h", "1h"]:
-            if signals.get(tf) == "BUY":
-                if (
-                    f"{self.symbol}_{tf}" not in self.open_positions
-                    and len(self.open_positions) < RISK_CONFIG["max_positions_total"]
-                ):
-                    return [tf]
-        return []
-
-    def _get_execution_price(self, ideal_price, side, atr_pct=0):
-        if side == "buy":
-            price = ideal_price * (1 + self.spread + self.slippage)
-        elif side == "sell":
-            price = ideal_price * (1 - self.spread - self.slippage)
-        elif side == "stop_loss":
-            volatility_slippage = self.slippage * (1 + atr_pct * 5)
-            price = ideal_price * (1 - self.spread - self.slippage - volatility_slippage)
-        return price
+        df["is_fomc"] = fomc_flags(df.index)
+
+    def _signal_arrays(self):
+        """
+        Entry conditions for every bar at once, as a (timeframe, bar) bool matrix in TIMEFRAME_CONFIG order.
+        A timeframe signals BUY when its candle isn't extended, volatility isn't high, it isn't an FOMC day,
+        price is above its SMA, RSI is below the entry maximum and volume is above its 20-bar average.
+        """
+        aligned = self.aligned_data
+        signals = np.empty((len(TIMEFRAME_CONFIG), len(aligned)), dtype=np.bool_)
+        for row, (tf, config) in enumerate(TIMEFRAME_CONFIG.items()):
+            suffix = f"_{tf}" if tf != "1h" else ""
+            blocked = (
+                aligned[f"candle_extended{suffix}"] | aligned[f"volatility_high{suffix}"] | aligned[f"is_fomc{suffix}"]
+            )
+            trend = aligned[f"close{suffix}"] > aligned[f'sma_{config["sma_period"]}{suffix}']
+            rsi_ok = aligned[f"rsi{suffix}"] < config["rsi_entry_max"]
+            volume_ok = aligned[f"volume{suffix}"] > aligned[f"volume_sma_20{suffix}"]
+            signals[row] = (~blocked & trend & rsi_ok & volume_ok).to_numpy(dtype=bool)
+        return signals
 
     def run_backtest(self, show_plot=True):
         print(f"--- Running Backtest for {self.symbol} ---")
-        for i, row in self.aligned_data.iterrows():
-            timestamp = i
-            positions_to_close = []
-            for pos_key, pos in self.open_positions.items():
-                exit_reason, exit_price = None, None
-                if row["low"] <= pos["stop_loss"]:
-                    exit_reason, atr_pct = "Stop Loss", row["atr_14"] / pos["stop_loss"]
-                    exit_price = self._get_execution_price(pos["stop_loss"], "stop_loss", atr_pct)
-                elif row["high"] >= pos["take_profit"]:
-                    exit_reason, exit_price = "Take Profit", self._get_execution_price(pos["take_profit"], "sell")
-                if exit_reason:
-                    pnl = (exit_price - pos["entry_price"]) * pos["size"]
-                    total_fees = (pos["entry_price"] * pos["size"] + exit_price * pos["size"]) * self.fee_rate
-                    net_pnl = pnl - total_fees
-                    self.capital += net_pnl
-                    pos.update(
-                        {
-                            "exit_date": timestamp,
-                            "exit_price": exit_price,
-                            "pnl": net_pnl,
-                            "exit_reason": exit_reason,
-                            "net_pnl": net_pnl,
-                        }
-                    )
-                    self.trades.append(pos)
-                    positions_to_close.append(pos_key)
-            for key in positions_to_close:
-                del self.open_positions[key]
-            signals = {tf: self._check_signal(row, tf, config) for tf, config in TIMEFRAME_CONFIG.items()}
-            signals_to_take = self._resolve_signals(signals)
-            for tf in signals_to_take:
-                if random.random() < 0.05:
-                    continue
-                config = TIMEFRAME_CONFIG[tf]
-                atr_pct = row["atr_14"] / row["close"]
-                entry_price = self._get_execution_price(row["close"], "buy", atr_pct)
-                position_size_usd = self.capital * (config["position_size_pct"] / 100.0)
-                size_in_asset = position_size_usd / entry_price
-                stop_loss_price, take_profit_price = entry_price * (1 - config["stop_loss"]), entry_price * (
-                    1 + config["take_profit"]
-                )
-                position_key = f"{self.symbol}_{tf}"
-                position = {
-                    "key": position_key,
+        aligned = self.aligned_data
+        n = len(aligned)
+        timeframes = list(TIMEFRAME_CONFIG)
+        configs = list(TIMEFRAME_CONFIG.values())
+
+        # The bar loop is JIT-compiled over plain arrays; signals and the random skips are precomputed.
+        equity, trade_arrays, n_trades, slots = _simulate(
+            aligned["low"].to_numpy(dtype=np.float64),
+            aligned["high"].to_numpy(dtype=np.float64),
+            aligned["close"].to_numpy(dtype=np.float64),
+            aligned["atr_14"].to_numpy(dtype=np.float64),
+            self._signal_arrays(),
+            skip_mask(n, self.seed),
+            np.array([float(c["position_size_pct"]) for c in configs]),
+            np.array([c["stop_loss"] for c in configs]),
+            np.array([c["take_profit"] for c in configs]),
+            float(self.capital),
+            self.spread,
+            self.slippage,
+            self.fee_rate,
+            RISK_CONFIG["max_positions_total"],
+        )
+
+        index = aligned.index
+        # Back to Python scalars, trimmed to the trades that actually closed.
+        tf_idx, entry_k, exit_k, entry_price, exit_price, size, stop, take, notional, net_pnl, reason = (
+            arr[:n_trades].tolist() for arr in trade_arrays
+        )
+        for t in range(n_trades):
+            tf = timeframes[tf_idx[t]]
+            self.trades.append(
+                {
+                    "key": f"{self.symbol}_{tf}",
                     "tf": tf,
-                    "entry_date": timestamp,
-                    "entry_price": entry_price,
-                    "size": size_in_asset,
-                    "stop_loss": stop_loss_price,
-                    "take_profit": take_profit_price,
-                    "notional": position_size_usd,
+                    "entry_date": index[entry_k[t]],
+                    "entry_price": entry_price[t],
+                    "size": size[t],
+                    "stop_loss": stop[t],
+                    "take_profit": take[t],
+                    "notional": notional[t],
+                    "exit_date": index[exit_k[t]],
+                    "exit_price": exit_price[t],
+                    "pnl": net_pnl[t],
+                    "exit_reason": EXIT_REASONS[reason[t]],
+                    "net_pnl": net_pnl[t],
                 }
-                self.open_positions[position_key] = position
-            self.equity_curve.append({"timestamp": timestamp, "equity": self.capital})
+            )
+        is_open, slot_entry, slot_price, slot_size, slot_stop, slot_take, slot_notional = (
+            arr.tolist() for arr in slots
+        )
+        for s in sorted(range(len(timeframes)), key=slot_entry.__getitem__):
+            if is_open[s]:
+                tf = timeframes[s]
+                self.open_positions[f"{self.symbol}_{tf}"] = {
+                    "key": f"{self.symbol}_{tf}",
+                    "tf": tf,
+                    "entry_date": index[slot_entry[s]],
+                    "entry_price": slot_price[s],
+                    "size": slot_size[s],
+                    "stop_loss": slot_stop[s],
+                    "take_profit": slot_take[s],
+                    "notional": slot_notional[s],
+                }
+
+        if n:
+            self.capital = float(equity[-1])
+        self.equity_curve = pd.Series(equity, index=index, name="equity")
         return self._calculate_stats(show_plot=show_plot)
 
     def _calculate_stats(self, show_plot=True):
         if not self.trades:
             return {"error": "No trades were executed."}
-        equity_df = pd.DataFrame(self.equity_curve).set_index("timestamp")
+        equity_df = self.equity_curve.rename_axis("timestamp").to_frame()
         total_return = (self.capital / 100.0) - 1
         daily_returns = equity_df["equity"].pct_change().dropna()
         sharpe_ratio = (daily_returns.mean() / daily_returns.std()) * np.sqrt(365) if daily_returns.std() > 0 else 0
@@ -256,7 +368,7 @@ if __name__ == "__main__":
         for tf in timeframes:
             filename = f"data/{symbol.replace('/', '_')}_{tf}_ohlcv.csv"
             try:
-                data[tf] = pd.read_csv(filename, index_col="timestamp", parse_dates=True)
+                data[tf] = read_timeseries(filename)
             except FileNotFoundError:
                 print(f"ERROR: Missing data file: {filename}. Please run data collector.")
                 sys.exit()
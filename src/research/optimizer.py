@@ -1,10 +1,10 @@
 import pandas as pd
-import itertools
+import numpy as np
 from tqdm import tqdm
 import os
 import sys
 
-from ..funding_arb_backtester import run_funding_arb_backtest
+from ..funding_arb_backtester import run_grid
 
 SYMBOL_TO_OPTIMIZE = "DOGE/USDT"
 START_YEAR = 2022
@@ -23,54 +23,61 @@ def run_optimizer():
     print("--- Starting MENTOR-DIRECTED AGGRESSIVE Parameter Optimizer ---")
     print(f"Goal: Find params with Sharpe > 1.2 and high trade frequency for {SYMBOL_TO_OPTIMIZE}")
 
-    # Generate all unique combinations of parameters
-    param_combinations = list(itertools.product(ENTRY_THRESHOLDS, EXIT_THRESHOLDS, REGIME_FILTER_PERIODS))
-
-    # Filter out invalid combinations where exit threshold is >= entry threshold
-    valid_combinations = [p for p in param_combinations if p[1] < p[0]]
+    # Generate only the valid combinations: the exit threshold must be below the entry threshold
+    valid_combinations = [
+        (entry_apr, exit_apr, filter_periods)
+        for entry_apr in ENTRY_THRESHOLDS
+        for exit_apr in EXIT_THRESHOLDS
+        if exit_apr < entry_apr
+        for filter_periods in REGIME_FILTER_PERIODS
+    ]
 
     print(f"Generated {len(valid_combinations)} unique parameter combinations to test.")
 
-    all_results = []
-
-    # Use tqdm for a progress bar
-    for params in tqdm(valid_combinations, desc=f"Optimizing {SYMBOL_TO_OPTIMIZE}"):
-        entry_apr, exit_apr, filter_periods = params
-
-        # Create the parameter dictionary the new backtester expects
-        temp_optimal_params = {
-            SYMBOL_TO_OPTIMIZE: {
-                "entry_apr": entry_apr,
-                "exit_apr": exit_apr,
-                "filter_periods": filter_periods,
-            }
-        }
-
-        # Run the backtest with the current set of parameters
-        result = run_funding_arb_backtest(
-            symbol=SYMBOL_TO_OPTIMIZE,
-            start_year=START_YEAR,
-            optimal_params=temp_optimal_params,
-            show_plot=False,  # We only want the numbers
-            verbose=False,
+    # Fan the backtests out across all cores; tqdm still reports progress as results arrive in order.
+    cases = [
+        (
+            SYMBOL_TO_OPTIMIZE,
+            START_YEAR,
+            {"entry_apr": entry_apr, "exit_apr": exit_apr, "filter_periods": filter_periods},
         )
-
+        for entry_apr, exit_apr, filter_periods in valid_combinations
+    ]
+    results = run_grid(cases)
+
+    # One typed array per report column, filled by combination index and turned into a DataFrame in one go.
+    n = len(valid_combinations)
+    columns = {
+        "Net Profit": np.full(n, np.nan),
+        "Total Return (%)": np.full(n, np.nan),
+        "Sharpe Ratio": np.full(n, np.nan),
+        "Max Drawdown (%)": np.full(n, np.nan),
+        "Total Trades": np.zeros(n, dtype=np.int64),
+        # Thresholds may be fractional (e.g. 7.5), so they must not be stored as integers.
+        "Entry APR": np.zeros(n),
+        "Exit APR": np.zeros(n),
+        "Filter Periods": np.zeros(n, dtype=np.int64),
+    }
+    ok = np.zeros(n, dtype=bool)
+
+    for k, (params, result) in enumerate(
+        tqdm(zip(valid_combinations, results), total=n, desc=f"Optimizing {SYMBOL_TO_OPTIMIZE}")
+    ):
         if "error" in result:
             print(f"Skipping a run due to error: {result['error']}")
             continue
 
-        result["Entry APR"] = entry_apr
-        result["Exit APR"] = exit_apr
-        result["Filter Periods"] = filter_periods
-
-        all_results.append(result)
+        for name, value in result.items():
+            columns[name][k] = value
+        columns["Entry APR"][k], columns["Exit APR"][k], columns["Filter Periods"][k] = params
+        ok[k] = True
 
     # --- Reporting ---
-    if not all_results:
+    if not ok.any():
         print("Optimization run failed to produce results.")
         return
 
-    results_df = pd.DataFrame(all_results)
+    results_df = pd.DataFrame({name: arr[ok] for name, arr in columns.items()})
 
     # Calculate Annualized Return for better analysis
     # (Total Return / Number of Years)
@@ -1,6 +1,56 @@
+import functools
 import pandas as pd
 import os
 
+from ..symbols import perp_symbol_for
+
+CACHE_DIR = "data/cache"
+
+
+def _read_column(csv_file, column):
+    """Reads just the timestamp and one float64 column of a collected CSV, with the PyArrow parser."""
+    return pd.read_csv(
+        csv_file,
+        engine="pyarrow",
+        usecols=["timestamp", column],
+        dtype={column: "float64"},
+        parse_dates=["timestamp"],
+    ).set_index("timestamp")
+
+
+@functools.lru_cache(maxsize=16)
+def _load_aligned(symbol):
+    """
+    Spot close, perp close and funding rate for the symbol's whole history, on one forward-filled hourly grid.
+
+    Cached in memory per symbol, and on disk as Parquet under data/cache/ (rebuilt whenever a source CSV
+    is newer), so every scenario and every later run only has to slice out its year.
+    Raises FileNotFoundError if a source file is missing.
+    """
+    spot_file = f"data/{symbol.replace('/', '_')}_1h_ohlcv.csv"
+    # The data collector names perp files after the full perp symbol, e.g. BTC_USDT_USDT.
+    perp_file = f"data/{perp_symbol_for(symbol).replace('/', '_').replace(':', '_')}_1h_ohlcv.csv"
+    funding_file = f"data/{symbol.replace('/', '_')}_funding_rates.csv"
+
+    newest_source = max(os.path.getmtime(f) for f in (spot_file, perp_file, funding_file))
+    cache_file = os.path.join(CACHE_DIR, f"{symbol.replace('/', '_')}_aligned.parquet")
+    if os.path.exists(cache_file) and os.path.getmtime(cache_file) > newest_source:
+        return pd.read_parquet(cache_file)
+
+    df = pd.concat(
+        [
+            _read_column(spot_file, "close")["close"].rename("spot_close"),
+            _read_column(perp_file, "close")["close"].rename("perp_close"),
+            _read_column(funding_file, "fundingRate")["fundingRate"],
+        ],
+        axis=1,
+    )
+    df = df.resample("h").last().ffill().dropna()
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    df.to_parquet(cache_file)
+    return df
+
 
 def run_sanity_check(symbol, year, basis_threshold_bps=50):
     """
@@ -12,36 +62,21 @@ def run_sanity_check(symbol, year, basis_threshold_bps=50):
     print(f"  - Basis Threshold: > {basis_threshold_bps} bps")
     print("----------------------------")
 
-    # --- 1. Define file paths ---
-    spot_file = f"data/{symbol.replace('/', '_')}_1h_ohlcv.csv"
-    # This handles the filename change from the data collector script
-    perp_symbol_for_file = f"{symbol.split('/')[0]}_USDT_USDT"
-    perp_file = f"data/{perp_symbol_for_file}_1h_ohlcv.csv"
-    funding_file = f"data/{symbol.replace('/', '_')}_funding_rates.csv"
-
-    # --- 2. Load data and handle potential errors ---
+    # --- 1. Load the aligned history and handle potential errors ---
     try:
-        df_spot = pd.read_csv(spot_file, index_col="timestamp", parse_dates=True)
-        df_perp = pd.read_csv(perp_file, index_col="timestamp", parse_dates=True)
-        df_funding = pd.read_csv(funding_file, index_col="timestamp", parse_dates=True)
+        aligned = _load_aligned(symbol)
     except FileNotFoundError as e:
         print(f"ERROR: A required data file was not found: {e}")
         return
 
-    # --- 3. Prepare and merge data ---
-    df = pd.concat(
-        [df_spot["close"].rename("spot_close"), df_perp["close"].rename("perp_close"), df_funding["fundingRate"]],
-        axis=1,
-    )
-
-    df = df.resample("h").last().ffill().dropna()
-    df = df[df.index.year == year]
+    # --- 2. Select the year (a copy, so the cached frame is never modified) ---
+    df = aligned.loc[f"{year}-01-01":f"{year}-12-31"].copy()
 
     if df.empty:
         print(f"No aligned data found for {year}. Cannot perform check.")
         return
 
-    # --- 4. Perform the analysis ---
+    # --- 3. Perform the analysis ---
     df["basis_bps"] = ((df["perp_close"] - df["spot_close"]) / df["spot_close"]) * 10000
 
     opportunity_hours = df[(df["basis_bps"] > basis_threshold_bps) & (df["fundingRate"] > 0)]
@@ -49,7 +84,7 @@ def run_sanity_check(symbol, year, basis_threshold_bps=50):
     total_hours_in_year = len(df)
     profitable_hours = len(opportunity_hours)
 
-    # --- 5. Report the findings ---
+    # --- 4. Report the findings ---
     print(f"Analysis Complete:")
     print(f"Total Hours Analyzed: {total_hours_in_year}")
     print(f"Profitable Opportunity Hours: {profitable_hours}")
@@ -2,38 +2,208 @@
 
 import pandas as pd
 import numpy as np
-import random
 from datetime import datetime
 import matplotlib.pyplot as plt
 import sys
 import os
+from numba import njit
 
-FOMC_DATES = [
-    "2022-01-26",
-    "2022-03-16",
-    "2022-05-04",
-    "2022-06-15",
-    "2022-07-27",
-    "2022-09-21",
-    "2022-11-02",
-    "2022-12-14",
-    "2023-02-01",
-    "2023-03-22",
-    "2023-05-03",
-    "2023-06-14",
-    "2023-07-26",
-    "2023-09-20",
-    "2023-11-01",
-    "2023-12-13",
-    "2024-01-31",
-    "2024-03-20",
-    "2024-05-01",
-    "2024-06-12",
-    "2024-07-31",
-    "2024-09-18",
-    "2024-11-07",
-    "2024-12-18",
-]
+from ..data_loader import read_timeseries
+from .backtest_common import EXIT_REASONS, fomc_flags, skip_mask, true_range
+
+
+@njit(cache=True)
+def _rolling_mean(values, window):
+    """
+    Series.rolling(window).mean() over a float64 array, in one compiled pass.
+
+    Mirrors pandas' own kernel (Kahan-compensated running sum, NaNs skipped, constant windows returned
+    exactly, sign clamping), so it gives bit-identical results.
+    """
+    n = len(values)
+    out = np.empty(n)
+    nobs, neg_ct, same_count = 0, 0, 0
+    sum_x, comp_add, comp_remove = 0.0, 0.0, 0.0
+    prev_value = values[0] if n else 0.0
+    for i in range(n):
+        if i >= window:
+            val = values[i - window]
+            if not np.isnan(val):
+                nobs -= 1
+                y = -val - comp_remove
+                t = sum_x + y
+                comp_remove = t - sum_x - y
+                sum_x = t
+                if np.signbit(val):
+                    neg_ct -= 1
+        val = values[i]
+        if not np.isnan(val):
+            nobs += 1
+            y = val - comp_add
+            t = sum_x + y
+            comp_add = t - sum_x - y
+            sum_x = t
+            if np.signbit(val):
+                neg_ct += 1
+            same_count = same_count + 1 if val == prev_value else 1
+            prev_value = val
+        if nobs >= window:
+            result = sum_x / nobs
+            if same_count >= nobs:
+                result = prev_value
+            elif neg_ct == 0 and result < 0:
+                result = 0.0
+            elif neg_ct == nobs and result > 0:
+                result = 0.0
+            out[i] = result
+        else:
+            out[i] = np.nan
+    return out
+
+
+@njit(cache=True)
+def _vwap(high, low, volume):
+    """Cumulative VWAP on the bar midpoint, accumulated in one pass. NaN until some volume has traded."""
+    n = len(volume)
+    out = np.empty(n)
+    cum_pv, cum_v = 0.0, 0.0
+    for i in range(n):
+        cum_pv += volume[i] * (high[i] + low[i]) / 2
+        cum_v += volume[i]
+        out[i] = cum_pv / cum_v if cum_v > 0 else np.nan
+    return out
+
+
+@njit(cache=True)
+def _pullback_flags(close, window, pct):
+    """
+    close < pct * (max close over the last `window` bars), for every bar, in one pass.
+
+    The window maximum comes from a monotonic deque of bar indices (ring buffer), so each bar is
+    pushed and popped at most once. Bars before the first full window are False.
+    """
+    n = len(close)
+    out = np.zeros(n, dtype=np.bool_)
+    dq = np.empty(window, dtype=np.int64)
+    head, size = 0, 0
+    for i in range(n):
+        if size and dq[head] <= i - window:
+            head = (head + 1) % window
+            size -= 1
+        while size and close[dq[(head + size - 1) % window]] <= close[i]:
+            size -= 1
+        dq[(head + size) % window] = i
+        size += 1
+        if i >= window - 1:
+            out[i] = close[i] < close[dq[head]] * pct
+    return out
+
+
+@njit(cache=True)
+def _simulate(
+    low,
+    high,
+    close,
+    atr,
+    entry_signal,
+    skip,
+    size_pct,
+    stop_loss_pct,
+    take_profit_pct,
+    start_equity,
+    spread,
+    slippage,
+    fee_rate,
+    max_positions,
+):
+    """
+    Compiled bar loop behind TrendBacktester.run_backtest.
+
+    Open positions live in fixed-size arrays (at most max_positions), kept in the order they were opened.
+    Closed trades are written to the t_* arrays in the order they close; the pos_* arrays hold whatever
+    is still open at the end.
+    """
+    n = len(close)
+    equity = np.empty(n)
+
+    pos_entry = np.zeros(max_positions, dtype=np.int64)
+    pos_price = np.zeros(max_positions)
+    pos_size = np.zeros(max_positions)
+    pos_stop = np.zeros(max_positions)
+    pos_take = np.zeros(max_positions)
+    n_open = 0
+
+    t_entry = np.empty(n, dtype=np.int64)
+    t_exit = np.empty(n, dtype=np.int64)
+    t_entry_price = np.empty(n)
+    t_exit_price = np.empty(n)
+    t_size = np.empty(n)
+    t_stop = np.empty(n)
+    t_take = np.empty(n)
+    t_pnl = np.empty(n)
+    t_reason = np.empty(n, dtype=np.int64)
+    n_trades = 0
+
+    capital = start_equity
+    for k in range(n):
+        # --- Exits, oldest position first; survivors are compacted to the front ---
+        kept = 0
+        for j in range(n_open):
+            reason = 0
+            if low[k] <= pos_stop[j]:
+                reason = 1
+                atr_pct = atr[k] / pos_stop[j]
+                volatility_slippage = slippage * (1 + atr_pct * 5)
+                exit_price = pos_stop[j] * (1 - spread - slippage - volatility_slippage)
+            elif high[k] >= pos_take[j]:
+                reason = 2
+                exit_price = pos_take[j] * (1 - spread - slippage)
+
+            if reason == 0:
+                pos_entry[kept] = pos_entry[j]
+                pos_price[kept] = pos_price[j]
+                pos_size[kept] = pos_size[j]
+                pos_stop[kept] = pos_stop[j]
+                pos_take[kept] = pos_take[j]
+                kept += 1
+                continue
+
+            pnl = (exit_price - pos_price[j]) * pos_size[j]
+            total_fees = (pos_price[j] * pos_size[j] + exit_price * pos_size[j]) * fee_rate
+            net_pnl = pnl - total_fees
+            capital += net_pnl
+
+            t_entry[n_trades] = pos_entry[j]
+            t_exit[n_trades] = k
+            t_entry_price[n_trades] = pos_price[j]
+            t_exit_price[n_trades] = exit_price
+            t_size[n_trades] = pos_size[j]
+            t_stop[n_trades] = pos_stop[j]
+            t_take[n_trades] = pos_take[j]
+            t_pnl[n_trades] = net_pnl
+            t_reason[n_trades] = reason
+            n_trades += 1
+        n_open = kept
+
+        # --- Entry ---
+        if entry_signal[k] and n_open < max_positions and not skip[k]:
+            entry_price = close[k] * (1 + spread + slippage)
+            position_size_usd = capital * (size_pct / 100.0)
+            pos_entry[n_open] = k
+            pos_price[n_open] = entry_price
+            pos_size[n_open] = position_size_usd / entry_price
+            pos_stop[n_open] = entry_price * (1 - stop_loss_pct / 100.0)
+            pos_take[n_open] = entry_price * (1 + take_profit_pct / 100.0)
+            n_open += 1
+
+        equity[k] = capital
+
+    return (
+        equity,
+        (t_entry, t_exit, t_entry_price, t_exit_price, t_size, t_stop, t_take, t_pnl, t_reason),
+        n_trades,
+        (pos_entry[:n_open], pos_price[:n_open], pos_size[:n_open], pos_stop[:n_open], pos_take[:n_open]),
+    )
 
 
 class TrendBacktester:
@@ -42,143 +212,132 @@ class TrendBacktester:
     the mentor's final specifications.
     """
 
-    def __init__(self, data, params, test_name="Default"):
-        self.data = data.copy()
+    def __init__(self, data, params, test_name="Default", indicators=None, seed=42):
+        # `indicators` is a frame from precompute_indicators() for the same sma/rsi periods. It is only
+        # read, never modified, so one frame can be shared by every backtest in an optimizer grid.
+        self.precomputed = indicators is not None
+        self.data = indicators if self.precomputed else data.copy()
         self.params = params
         self.test_name = test_name
+        self.seed = seed  # seeds the missed-fill skips, so a rerun reproduces the same trades
         self.spread, self.slippage, self.fee_rate = 0.0005, 0.0005, 0.001
         self.equity, self.equity_curve, self.trades, self.open_positions = 100.0, [], [], []
 
+    @classmethod
+    def precompute_indicators(cls, data, sma_period=200, rsi_period=14):
+        """Builds the indicator frame once, for reuse by many backtests via `indicators=`."""
+        backtester = cls(data, {"sma_period": sma_period, "rsi_period": rsi_period})
+        backtester._calculate_indicators()
+        return backtester.data
+
     def _calculate_indicators(self):
         """Calculates all indicators needed for all possible setups."""
         # --- Standard Indicators ---
-        self.data["sma_200"] = self.data["close"].rolling(window=self.params.get("sma_period", 200)).mean()
-        self.data["sma_50"] = self.data["close"].rolling(window=50).mean()
+        # Rolling means run through the compiled _rolling_mean on plain float64 arrays.
+        close = self.data["close"].to_numpy(dtype=np.float64)
+        self.data["sma_200"] = _rolling_mean(close, self.params.get("sma_period", 200))
+        self.data["sma_50"] = _rolling_mean(close, 50)
 
-        delta = self.data["close"].diff()
-        gain = delta.where(delta > 0, 0).rolling(window=self.params.get("rsi_period", 14)).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=self.params.get("rsi_period", 14)).mean()
+        rsi_period = self.params.get("rsi_period", 14)
+        # Differenced in the data's own dtype, as Series.diff() did; the first bar counts as 0 on both sides.
+        delta = np.diff(self.data["close"].to_numpy(), prepend=np.nan)
+        gain = _rolling_mean(np.where(delta > 0, delta, 0.0).astype(np.float64), rsi_period)
+        loss = _rolling_mean(-np.where(delta < 0, delta, 0.0).astype(np.float64), rsi_period)
         self.data["rsi"] = 100 - (100 / (1 + (gain / loss)))
 
-        self.data["volume_sma_20"] = self.data["volume"].rolling(window=20).mean()
+        self.data["volume_sma_20"] = _rolling_mean(self.data["volume"].to_numpy(dtype=np.float64), 20)
 
         # --- ATR ---
-        tr_df = pd.DataFrame(
-            {
-                "hl": self.data["high"] - self.data["low"],
-                "hc": np.abs(self.data["high"] - self.data["close"].shift()),
-                "lc": np.abs(self.data["low"] - self.data["close"].shift()),
-            }
-        )
-        self.data["atr_14"] = tr_df.max(axis=1).rolling(window=14).mean()
+        tr = true_range(*(self.data[c].to_numpy() for c in ("high", "low", "close")))
+        self.data["atr_14"] = _rolling_mean(tr.astype(np.float64), 14)
 
         # --- Indicators for New Setups ---
-        self.data["vwap"] = (self.data["volume"] * (self.data["high"] + self.data["low"]) / 2).cumsum() / self.data[
-            "volume"
-        ].cumsum()
-        self.data["rolling_max_10d"] = self.data["close"].rolling(window=10).max()
-        self.data["pullback_5pct"] = self.data["close"] < (self.data["rolling_max_10d"] * 0.95)
+        self.data["vwap"] = _vwap(*(self.data[c].to_numpy(dtype=np.float64) for c in ("high", "low", "volume")))
+        self.data["pullback_5pct"] = _pullback_flags(close, 10, 0.95)
 
-        self.data["is_fomc"] = self.data.index.strftime("%Y-%m-%d").isin(FOMC_DATES)
+        self.data["is_fomc"] = fomc_flags(self.data.index)
         self.data.dropna(inplace=True)
 
-    def _check_entry_conditions(self, row):
-        """Acts as a router to the correct entry setup function."""
+    def _entry_signals(self):
+        """
+        Entry conditions for every bar at once, as a bool array for the configured entry setup.
+        Every setup first requires the common filters: the candle isn't extended, volatility is normal
+        and it isn't an FOMC day. The open-position limit is applied bar by bar in _simulate.
+        """
+        # float64 throughout, so float32 input compares exactly as the per-row Python floats used to.
+        col = lambda name: self.data[name].to_numpy(dtype=np.float64)
+        close, open_, volume, volume_sma_20 = col("close"), col("open"), col("volume"), col("volume_sma_20")
+        common = ((close - open_) / open_ < 0.05) & (col("atr_14") / close < 0.03) & ~self.data["is_fomc"].to_numpy()
+
         setup = self.params.get("entry_setup", "A")  # Default to classic trend
-        if setup == "A":
-            return self._check_setup_A_classic_trend(row)
-        if setup == "B":
-            return self._check_setup_B_pullback_to_50d(row)
-        if setup == "C":
-            return self._check_setup_C_volume_spike(row)
-        return False
-
-    def _check_common_filters(self, row):
-        """Checks filters that apply to all strategies."""
-        if len(self.open_positions) >= self.params["max_positions"]:
-            return False
-        candle_not_extended = (row["close"] - row["open"]) / row["open"] < 0.05
-        volatility_normal = (row["atr_14"] / row["close"]) < 0.03
-        not_event_day = not row["is_fomc"]
-        return all([candle_not_extended, volatility_normal, not_event_day])
-
-    def _check_setup_A_classic_trend(self, row):
-        if not self._check_common_filters(row):
-            return False
-        above_sma = row["close"] > row["sma_200"]
-        rsi_not_overbought = row["rsi"] < self.params["rsi_entry_max"]
-        volume_conf = row["volume"] > row["volume_sma_20"]
-        return all([above_sma, rsi_not_overbought, volume_conf])
-
-    def _check_setup_B_pullback_to_50d(self, row):
-        if not self._check_common_filters(row):
-            return False
-        above_50d_sma = row["close"] > row["sma_50"]
-        is_pullback = row["pullback_5pct"]
-        return all([above_50d_sma, is_pullback])
-
-    def _check_setup_C_volume_spike(self, row):
-        if not self._check_common_filters(row):
-            return False
-        price_above_vwap = row["close"] > row["vwap"]
-        volume_spike = row["volume"] > (row["volume_sma_20"] * 2)  # Volume is 2x the average
-        return all([price_above_vwap, volume_spike])
+        if setup == "A":  # classic trend
+            setup_ok = (close > col("sma_200")) & (col("rsi") < self.params["rsi_entry_max"]) & (volume > volume_sma_20)
+        elif setup == "B":  # pullback to the 50d SMA
+            setup_ok = (close > col("sma_50")) & self.data["pullback_5pct"].to_numpy()
+        elif setup == "C":  # volume spike above VWAP; volume is 2x the average
+            setup_ok = (close > col("vwap")) & (volume > volume_sma_20 * 2)
+        else:
+            setup_ok = np.zeros(len(close), dtype=bool)
+        return common & setup_ok
 
     def run_backtest(self, show_plot=True):
-        self._calculate_indicators()
+        if not self.precomputed:
+            self._calculate_indicators()
         if self.data.empty:
             return {"error": "No data available for backtest."}
 
-        for i, row in self.data.iterrows():
-            positions_to_close = []
-            for pos in self.open_positions:
-                exit_reason, exit_price = None, None
-                if row["low"] <= pos["stop_loss"]:
-                    exit_reason, atr_pct = "Stop Loss", row["atr_14"] / pos["stop_loss"]
-                    exit_price = self._get_execution_price(pos["stop_loss"], "stop_loss", atr_pct)
-                elif row["high"] >= pos["take_profit"]:
-                    exit_reason = "Take Profit"
-                    exit_price = self._get_execution_price(pos["take_profit"], "sell", 0)
-                if exit_reason:
-                    pnl = (exit_price - pos["entry_price"]) * pos["size"]
-                    total_fees = (pos["entry_price"] * pos["size"] + exit_price * pos["size"]) * self.fee_rate
-                    net_pnl = pnl - total_fees
-                    self.equity += net_pnl
-                    pos.update({"exit_date": i, "exit_price": exit_price, "pnl": net_pnl, "exit_reason": exit_reason})
-                    self.trades.append(pos)
-                    positions_to_close.append(pos)
-            self.open_positions = [p for p in self.open_positions if p not in positions_to_close]
-            if self._check_entry_conditions(row):
-                if random.random() < 0.05:
-                    continue
-                atr_pct = row["atr_14"] / row["close"]
-                entry_price = self._get_execution_price(row["close"], "buy", atr_pct)
-                position_size_usd = self.equity * (self.params["position_size_pct"] / 100.0)
-                size_in_asset = position_size_usd / entry_price
-                stop_loss_price = entry_price * (1 - self.params["stop_loss_pct"] / 100.0)
-                take_profit_price = entry_price * (1 + self.params["take_profit_pct"] / 100.0)
-                position = {
-                    "entry_date": i,
+        n = len(self.data)
+        equity, trade_arrays, n_trades, open_arrays = _simulate(
+            self.data["low"].to_numpy(dtype=np.float64),
+            self.data["high"].to_numpy(dtype=np.float64),
+            self.data["close"].to_numpy(dtype=np.float64),
+            self.data["atr_14"].to_numpy(dtype=np.float64),
+            self._entry_signals(),
+            skip_mask(n, self.seed),
+            float(self.params["position_size_pct"]),
+            float(self.params["stop_loss_pct"]),
+            float(self.params["take_profit_pct"]),
+            float(self.equity),
+            self.spread,
+            self.slippage,
+            self.fee_rate,
+            self.params["max_positions"],
+        )
+
+        index = self.data.index
+        # Back to Python scalars, trimmed to the trades that actually closed.
+        entry_k, exit_k, entry_price, exit_price, size, stop, take, net_pnl, reason = (
+            arr[:n_trades].tolist() for arr in trade_arrays
+        )
+        for t in range(n_trades):
+            self.trades.append(
+                {
+                    "entry_date": index[entry_k[t]],
+                    "entry_price": entry_price[t],
+                    "size": size[t],
+                    "stop_loss": stop[t],
+                    "take_profit": take[t],
+                    "exit_date": index[exit_k[t]],
+                    "exit_price": exit_price[t],
+                    "pnl": net_pnl[t],
+                    "exit_reason": EXIT_REASONS[reason[t]],
+                }
+            )
+        for entry_k, entry_price, size, stop, take in zip(*(arr.tolist() for arr in open_arrays)):
+            self.open_positions.append(
+                {
+                    "entry_date": index[entry_k],
                     "entry_price": entry_price,
-                    "size": size_in_asset,
-                    "stop_loss": stop_loss_price,
-                    "take_profit": take_profit_price,
+                    "size": size,
+                    "stop_loss": stop,
+                    "take_profit": take,
                 }
-                self.open_positions.append(position)
-            self.equity_curve.append({"timestamp": i, "equity": self.equity})
+            )
 
+        self.equity = float(equity[-1])
+        self.equity_curve = pd.Series(equity, index=index, name="equity")
         return self._calculate_stats(show_plot=show_plot)
 
-    def _get_execution_price(self, ideal_price, side, atr_pct):
-        if side == "buy":
-            price = ideal_price * (1 + self.spread + self.slippage)
-        elif side == "sell":
-            price = ideal_price * (1 - self.spread - self.slippage)
-        elif side == "stop_loss":
-            volatility_slippage = self.slippage * (1 + atr_pct * 5)
-            price = ideal_price * (1 - self.spread - self.slippage - volatility_slippage)
-        return price
-
     def _sanity_check_results(self, results, num_years):
         trades_per_year = results["Total Trades"] / num_years if num_years > 0 else 0
         if results["Sharpe Ratio"] > 2.0:
@@ -206,12 +365,14 @@ class TrendBacktester:
         self._save_trade_log()
         if not self.trades:
             return {"error": "No trades were executed."}
-        equity_df = pd.DataFrame(self.equity_curve).set_index("timestamp")
-        num_years = (equity_df.index[-1] - equity_df.index[0]).days / 365.25
+        # Straight off the equity array; a DataFrame is only built if there is a plot to draw.
+        equity = self.equity_curve.to_numpy()
+        num_years = (self.equity_curve.index[-1] - self.equity_curve.index[0]).days / 365.25
         total_return = (self.equity / 100.0) - 1
-        daily_returns = equity_df["equity"].pct_change().dropna()
-        sharpe_ratio = (daily_returns.mean() / daily_returns.std()) * np.sqrt(365) if daily_returns.std() > 0 else 0
-        max_drawdown = abs((equity_df["equity"] / equity_df["equity"].cummax() - 1).min())
+        daily_returns = equity[1:] / equity[:-1] - 1
+        returns_std = daily_returns.std(ddof=1) if len(daily_returns) > 1 else 0
+        sharpe_ratio = (daily_returns.mean() / returns_std) * np.sqrt(365) if returns_std > 0 else 0
+        max_drawdown = abs((equity / np.maximum.accumulate(equity) - 1).min())
         pnls = [t["pnl"] for t in self.trades]
         wins, losses = [p for p in pnls if p > 0], [p for p in pnls if p < 0]
         win_rate = len(wins) / len(pnls) if len(pnls) > 0 else 0
@@ -226,7 +387,7 @@ class TrendBacktester:
         }
         self._sanity_check_results(stats, num_years)
         if show_plot:
-            self._plot_results(equity_df, stats)
+            self._plot_results(self.equity_curve.rename_axis("timestamp").to_frame(), stats)
         return stats
 
     def _plot_results(self, equity_df, stats):
@@ -241,7 +402,7 @@ class TrendBacktester:
 if __name__ == "__main__":
     print("===== DYNAMIC ENGINE: SINGLE TEST RUN =====")
     try:
-        full_data_df = pd.read_csv("data/BTC_USDT_1d_ohlcv.csv", index_col="timestamp", parse_dates=True)
+        full_data_df = read_timeseries("data/BTC_USDT_1d_ohlcv.csv")
     except FileNotFoundError:
         print("ERROR: Please download BTC/USDT 1-day OHLCV data starting from 2018.")
         sys.exit()
@@ -3,9 +3,11 @@ import itertools
 from tqdm import tqdm
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 
 # Correctly import the backtester from its location
 from .trend_backtester import TrendBacktester
+from ..data_loader import read_timeseries
 
 PARAMETER_GRID = {
     "entry_setup": ["A", "B", "C"],  # The three different strategies to test
@@ -24,7 +26,28 @@ DATA_FILE = f"data/{SYMBOL.replace('/', '_')}_1d_ohlcv.csv"
 RESULTS_FILE = "research_results/dynamic_optimizer_report.csv"
 
 
-def run_trend_optimizer(data_df):
+_worker_data = None  # the price frame, set once per worker process by _init_worker
+_indicator_cache = {}  # (sma_period, rsi_period) -> indicator frame, per worker process
+
+
+def _init_worker(data_df):
+    global _worker_data
+    _worker_data = data_df
+
+
+def _evaluate(params):
+    test_name = f"Setup_{params['entry_setup']}_SL{params['stop_loss_pct']}_TP{params['take_profit_pct']}"
+    # Only sma_period and rsi_period change the indicators, so most of the grid shares one frame.
+    key = (params["sma_period"], params["rsi_period"])
+    if key not in _indicator_cache:
+        _indicator_cache[key] = TrendBacktester.precompute_indicators(_worker_data, *key)
+    backtester = TrendBacktester(
+        data=_worker_data, params=params, test_name=test_name, indicators=_indicator_cache[key]
+    )
+    return backtester.run_backtest(show_plot=False)
+
+
+def run_trend_optimizer(data_df, max_workers=None):
     """
     Runs the dynamic TrendBacktester with multiple parameter combinations and entry
     setups to find the optimal overall strategy.
@@ -38,17 +61,20 @@ def run_trend_optimizer(data_df):
 
     all_results = []
 
-    for params in tqdm(param_combinations, desc=f"Optimizing {SYMBOL}"):
-        test_name = f"Setup_{params['entry_setup']}_SL{params['stop_loss_pct']}_TP{params['take_profit_pct']}"
-        backtester = TrendBacktester(data=data_df, params=params, test_name=test_name)
-
-        results = backtester.run_backtest(show_plot=False)
-
-        if "error" in results:
-            continue
-
-        results.update(params)
-        all_results.append(results)
+    # Each combination is an independent, CPU-bound backtest, so they are spread across processes.
+    # The data is shipped to each worker once (initializer) instead of with every combination.
+    workers = max_workers or os.cpu_count() or 1
+    chunksize = max(1, len(param_combinations) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(data_df,)) as executor:
+        results_iter = executor.map(_evaluate, param_combinations, chunksize=chunksize)
+        for params, results in tqdm(
+            zip(param_combinations, results_iter), total=len(param_combinations), desc=f"Optimizing {SYMBOL}"
+        ):
+            if "error" in results:
+                continue
+
+            results.update(params)
+            all_results.append(results)
 
     if not all_results:
         print("Optimization run failed to produce results.")
@@ -89,7 +115,7 @@ def run_trend_optimizer(data_df):
 
 if __name__ == "__main__":
     try:
-        btc_data_df = pd.read_csv(DATA_FILE, index_col="timestamp", parse_dates=True)
+        btc_data_df = read_timeseries(DATA_FILE)
     except FileNotFoundError:
         print(f"ERROR: Data file not found at {DATA_FILE}")
         sys.exit()
@@ -1,5 +1,6 @@
 import psutil
 import os
+import time
 from src.bot.notifier import Notifier
 from src.bot.logger import logger
 
@@ -11,7 +12,15 @@ class RiskManager:
     Monitors equity for drawdowns, checks exchange maintenance, and monitors memory usage.
     """
 
-    def __init__(self, exchange, starting_capital, notifier, emergency_shutdown_threshold=0.80, max_memory_mb=500):
+    def __init__(
+        self,
+        exchange,
+        starting_capital,
+        notifier,
+        emergency_shutdown_threshold=0.80,
+        max_memory_mb=500,
+        memory_check_min_interval=5.0,
+    ):
         self.exchange = exchange
         self.starting_capital = starting_capital
         self.high_water_mark = starting_capital
@@ -19,9 +28,23 @@ class RiskManager:
         self.shutdown_threshold_pct = emergency_shutdown_threshold
         self.shutdown_threshold_value = starting_capital * emergency_shutdown_threshold
         self.max_memory_mb = max_memory_mb  # <-- NEW
+        # Calls closer together than this reuse the last reading instead of sampling, logging and alerting again.
+        self.memory_check_min_interval = memory_check_min_interval
+        self.last_memory_check = None  # monotonic time of the last real sample
+        self.last_memory_mb = None
+        # New highs are logged at most once a minute unless the mark has moved by more than 1% since the last line.
+        self.last_logged_hwm = starting_capital
+        self.last_hwm_log_time = time.monotonic()
 
         # Get the current process to monitor its memory
         self.process = psutil.Process(os.getpid())  # <-- NEW
+        # On Linux, RSS is read straight from /proc/self/statm through a descriptor kept open for the bot's
+        # lifetime (one pread per check); psutil is only the fallback elsewhere.
+        try:
+            self._statm_fd = os.open("/proc/self/statm", os.O_RDONLY)
+            self._page_kb = os.sysconf("SC_PAGE_SIZE") // 1024
+        except (OSError, AttributeError, ValueError):
+            self._statm_fd = None
 
         logger.info("Risk Manager initialized.")
         logger.info(f"  - High-Water Mark: ${self.high_water_mark:,.2f}")
@@ -29,12 +52,26 @@ class RiskManager:
         logger.info(f"  - Max Memory Threshold: {self.max_memory_mb} MB")
 
     def check_capital(self, current_capital):
-        """Checks the current capital against the drawdown threshold."""
+        """
+        Checks the current capital against the drawdown threshold.
+
+        The threshold value is only recomputed when the high-water mark moves, so the usual call is two
+        comparisons. A new high can come on every tick in a rising market, so the mark and threshold are
+        always updated but the log line is rate-limited (see last_logged_hwm).
+        """
         if current_capital > self.high_water_mark:
             self.high_water_mark = current_capital
-            self.shutdown_threshold_value = self.high_water_mark * self.shutdown_threshold_pct
-            logger.info(f"RISK MANAGER: New high-water mark! ${self.high_water_mark:,.2f}")
-            logger.info(f"  - New shutdown threshold: ${self.shutdown_threshold_value:,.2f}")
+            self.shutdown_threshold_value = current_capital * self.shutdown_threshold_pct
+            now = time.monotonic()
+            if current_capital > self.last_logged_hwm * 1.01 or now - self.last_hwm_log_time > 60:
+                self.last_logged_hwm = current_capital
+                self.last_hwm_log_time = now
+                logger.info(
+                    "RISK MANAGER: New high-water mark $%.2f, shutdown threshold now $%.2f",
+                    self.high_water_mark,
+                    self.shutdown_threshold_value,
+                )
+            return True
 
         if current_capital < self.shutdown_threshold_value:
             drawdown_pct = (1 - (current_capital / self.high_water_mark)) * 100
@@ -64,11 +101,31 @@ class RiskManager:
             return True  # Fail safe, allow operation but log the error
         return True
 
+    def _rss_mb(self):
+        """Resident set size of this process in MB."""
+        fd = self._statm_fd  # read once: close() may clear it from another thread
+        if fd is not None:
+            # statm is "size resident shared ..." in pages.
+            return int(os.pread(fd, 64, 0).split()[1]) * self._page_kb / 1024
+        return self.process.memory_info().rss / 1024 / 1024
+
+    def close(self):
+        """Releases the /proc/self/statm descriptor; later memory checks fall back to psutil."""
+        fd, self._statm_fd = self._statm_fd, None
+        if fd is not None:
+            os.close(fd)
+
     def check_memory_usage(self):
         """
         Checks the bot's current memory usage against a threshold.
+        At most one real check per memory_check_min_interval seconds; calls in between return at once.
         """
-        memory_mb = self.process.memory_info().rss / 1024 / 1024
+        now = time.monotonic()
+        if self.last_memory_check is not None and now - self.last_memory_check < self.memory_check_min_interval:
+            return True
+        self.last_memory_check = now
+
+        memory_mb = self.last_memory_mb = self._rss_mb()
         logger.info(f"Current memory usage: {memory_mb:.2f} MB")
 
         if memory_mb > self.max_memory_mb:
@@ -1,13 +1,108 @@
+import bisect
 import ccxt
-import pandas as pd
 from dotenv import load_dotenv
 import os
+import threading
 import time
+from collections import OrderedDict
+
+from src.bot.logger import logger
+from src.symbols import perp_symbol_for
+
+# Funding settles every 8 hours, so a fetched rate is reused for up to an hour before asking the exchange again.
+FUNDING_RATE_TTL_SECONDS = 3600
+# The bulk snapshot feeds live exit decisions, so it is only reused for a few minutes.
+SNAPSHOT_TTL_SECONDS = 300
+_funding_cache = {}  # perp symbol -> (funding rate, fetched_at)
+_snapshot_cache = {}  # "rates" -> (fetch_funding_rates() result, fetched_at)
+# (perp symbol, limit) -> (funding rate history, fetched_at), least recently used first. Bounded, because each
+# entry holds a list of dicts and the set of keys grows with the symbol universe. The live loop runs scans on a worker thread.
+HISTORY_CACHE_MAX_ENTRIES = 32
+_history_cache = OrderedDict()
+_history_cache_lock = threading.Lock()
+FUNDING_PERIOD_SECONDS = 8 * 3600  # settlements at 00/08/16 UTC
+# Binance stamps a settled rate at (or a few ms after) the settlement time; this much slack is plenty.
+SETTLEMENT_TOLERANCE_MS = 60_000
+APR_PER_FUNDING_RATE = 3 * 365 * 100  # one funding rate -> annualized APR (%), three payments a day
+
+
+def get_funding_rate(exchange, perp_symbol):
+    """fetch_funding_rate behind a per-symbol TTL cache. Returns None if the exchange reports no rate."""
+    now = time.time()
+    hit = _funding_cache.get(perp_symbol)
+    if hit and now - hit[1] < FUNDING_RATE_TTL_SECONDS:
+        return hit[0]
+    rate = exchange.fetch_funding_rate(perp_symbol).get("fundingRate")
+    if rate is not None:
+        _funding_cache[perp_symbol] = (rate, now)
+    return rate
+
+
+def get_funding_rates_snapshot(exchange):
+    """fetch_funding_rates (every perp in one request) behind a short SNAPSHOT_TTL_SECONDS cache."""
+    now = time.time()
+    hit = _snapshot_cache.get("rates")
+    if hit and now - hit[1] < SNAPSHOT_TTL_SECONDS:
+        return hit[0]
+    rates = exchange.fetch_funding_rates()
+    _snapshot_cache["rates"] = (rates, now)
+    return rates
+
+
+def latest_settlement_ms(now=None):
+    """Time (ms) of the most recent funding settlement at or before `now`."""
+    now = time.time() if now is None else now
+    return int(now // FUNDING_PERIOD_SECONDS * FUNDING_PERIOD_SECONDS * 1000)
+
+
+def includes_settlement(history, settlement_ms):
+    """True if a funding history already contains the rate settled at settlement_ms."""
+    return bool(history) and history[-1]["timestamp"] >= settlement_ms - SETTLEMENT_TOLERANCE_MS
+
+
+def get_funding_rate_history(exchange, perp_symbol, limit):
+    """
+    fetch_funding_rate_history behind the same TTL, and never reused across a funding settlement:
+    a history fetched before 08:00 UTC is stale at 08:00 even if it is only minutes old.
+    A history that doesn't show the latest settlement yet (the exchange can lag it) isn't cached at all.
+    """
+    key = (perp_symbol, limit)
+    now = time.time()
+    with _history_cache_lock:
+        hit = _history_cache.get(key)
+        if (
+            hit
+            and now - hit[1] < FUNDING_RATE_TTL_SECONDS
+            and now // FUNDING_PERIOD_SECONDS == hit[1] // FUNDING_PERIOD_SECONDS
+        ):
+            _history_cache.move_to_end(key)
+            return hit[0]
+    history = exchange.fetch_funding_rate_history(perp_symbol, limit=limit)
+    if not includes_settlement(history, latest_settlement_ms(now)):
+        return history
+    with _history_cache_lock:
+        _history_cache[key] = (history, now)
+        _history_cache.move_to_end(key)
+        while len(_history_cache) > HISTORY_CACHE_MAX_ENTRIES:
+            _history_cache.popitem(last=False)
+    return history
 
 
 class FundingArbStrategy:
+    STALE_AFTER_MS = 9 * 3600 * 1000  # a funding print older than this is not trusted
+
     def __init__(self, exchange):
+        """
+        `exchange` is the trading loop's shared ccxt client (see live_trader.create_exchange): the strategy
+        and sizing go through the same instance, so they share one keep-alive connection pool and one
+        rate-limit budget. Don't build a separate client for the strategy.
+        """
+        if exchange is None:
+            raise ValueError("FundingArbStrategy needs the shared exchange instance.")
         self.exchange = exchange
+        # Set by check_entry_signals when a scanned history didn't show the latest settlement yet (or couldn't
+        # be fetched), i.e. the scan should be repeated soon rather than at the next settlement.
+        self.awaiting_settlement = False
         self.optimal_params = {
             "BTC/USDT": {"entry_apr": 15.0, "exit_apr": 3.0, "filter_periods": 3},
             "ETH/USDT": {"entry_apr": 15.0, "exit_apr": 3.0, "filter_periods": 12},
@@ -20,100 +115,160 @@ class FundingArbStrategy:
             500: ["DOGE/USDT", "SOL/USDT", "ETH/USDT"],
             1000: ["DOGE/USDT", "SOL/USDT", "ETH/USDT", "BTC/USDT"],
         }
+        # Flat, immutable tier tables: callers share the returned tuples, so they can't be mutated in place.
+        self.tier_thresholds = tuple(sorted(self.capital_tiers))
+        self.tier_assets = tuple(tuple(self.capital_tiers[threshold]) for threshold in self.tier_thresholds)
 
-    def validate_signal(self, symbol, latest_data):
+    def validate_signal(self, symbol, latest_data, now_ms=None):
         """
         Performs sanity checks on the data before confirming a signal.
         Returns True if the signal is valid, False otherwise.
+        `now_ms` lets a caller validating several symbols read the clock once for all of them.
         """
         try:
-            data_timestamp_ms = latest_data["timestamp"]
-            current_timestamp_ms = int(time.time() * 1000)
-            time_diff_seconds = (current_timestamp_ms - data_timestamp_ms) / 1000
+            if now_ms is None:
+                now_ms = int(time.time() * 1000)
+            age_ms = now_ms - latest_data["timestamp"]
 
-            if time_diff_seconds > 9 * 3600:
-                print(f"  - VALIDATION FAILED for {symbol}: Data is stale ({time_diff_seconds / 3600:.2f} hours old).")
+            if age_ms > self.STALE_AFTER_MS:
+                logger.warning("VALIDATION FAILED for %s: Data is stale (%.2f hours old).", symbol, age_ms / 3_600_000)
                 return False
 
             current_apr = latest_data["apr"]
             if not (5.0 < current_apr < 1500.0):
-                print(
-                    f"  - VALIDATION FAILED for {symbol}: APR ({current_apr:.2f}%) is outside reasonable range (5%-1500%)."
+                logger.warning(
+                    "VALIDATION FAILED for %s: APR (%.2f%%) is outside reasonable range (5%%-1500%%).",
+                    symbol,
+                    current_apr,
                 )
                 return False
 
             return True
         except Exception as e:
-            print(f"  - VALIDATION ERROR for {symbol}: {e}")
+            logger.error("VALIDATION ERROR for %s: %s", symbol, e)
             return False
 
     def get_eligible_assets(self, current_capital):
-        eligible_assets = []
-        for threshold, assets in sorted(self.capital_tiers.items()):
-            if current_capital >= threshold:
-                eligible_assets = assets
-        return eligible_assets
+        """The assets of the highest capital tier at or below current_capital (none below the lowest tier)."""
+        idx = bisect.bisect_right(self.tier_thresholds, current_capital) - 1
+        return self.tier_assets[idx] if idx >= 0 else ()
 
     def check_entry_signals(self, current_capital):
+        """
+        Scans the eligible assets for entry signals.
+
+        Signals are decided on the last settled rates (the funding history), which only change at a
+        settlement, so the history cache keeps quiet scans to roughly one request per asset per hour.
+        """
+        self.awaiting_settlement = False
         eligible_assets = self.get_eligible_assets(current_capital)
         if not eligible_assets:
             return []
-        print(f"Capital: €{current_capital:.2f}. Eligible assets to scan for ENTRY: {eligible_assets}")
-        signals = []
+        logger.debug("Capital: €%.2f. Eligible assets to scan for ENTRY: %s", current_capital, eligible_assets)
+        candidates = []  # (symbol, params, perp_symbol) to fetch the history for
         for symbol in eligible_assets:
             params = self.optimal_params.get(symbol)
             if not params:
                 continue
+            candidates.append((symbol, params, perp_symbol_for(symbol)))
+
+        histories = self._fetch_histories(candidates)
+        now_ms = int(time.time() * 1000)
+        settlement_ms = latest_settlement_ms(now_ms / 1000)
+        self.awaiting_settlement = not all(
+            not isinstance(history, Exception) and includes_settlement(history, settlement_ms) for history in histories
+        )
+
+        signals = []
+        for (symbol, params, perp_symbol), history in zip(candidates, histories):
             try:
-                limit = params["filter_periods"] + 5
-                perp_symbol = f"{symbol.split('/')[0]}/USDT:USDT"
-                history = self.exchange.fetch_funding_rate_history(perp_symbol, limit=limit)
+                if isinstance(history, Exception):
+                    raise history
                 if len(history) < params["filter_periods"]:
                     continue
 
-                df = pd.DataFrame(history)
-                df["apr"] = (df["fundingRate"].astype(float) * 3 * 365) * 100
-                df["rolling_apr_avg"] = df["apr"].rolling(window=params["filter_periods"]).mean()
-                latest_data = df.iloc[-1]
+                # Both the latest APR and the average must clear entry_apr, so the cheap check goes first.
+                current_apr = float(history[-1]["fundingRate"]) * APR_PER_FUNDING_RATE
+                if current_apr <= params["entry_apr"]:
+                    logger.debug(
+                        "%s: Current APR=%.2f%% is below the Entry Threshold=%.2f%%",
+                        symbol,
+                        current_apr,
+                        params["entry_apr"],
+                    )
+                    continue
+
+                # Only the last filter_periods rates matter for the plain average.
+                aprs = [float(h["fundingRate"]) * APR_PER_FUNDING_RATE for h in history[-params["filter_periods"] :]]
+                latest_data = {
+                    "timestamp": history[-1]["timestamp"],
+                    "apr": current_apr,
+                    "rolling_apr_avg": sum(aprs) / len(aprs),
+                }
 
-                print(
-                    f"  - {symbol}: Current APR={latest_data['apr']:.2f}%, Avg APR={latest_data['rolling_apr_avg']:.2f}%, Entry Threshold={params['entry_apr']:.2f}%"
+                logger.debug(
+                    "%s: Current APR=%.2f%%, Avg APR=%.2f%%, Entry Threshold=%.2f%%",
+                    symbol,
+                    latest_data["apr"],
+                    latest_data["rolling_apr_avg"],
+                    params["entry_apr"],
                 )
 
-                if self.validate_signal(symbol, latest_data):
+                if self.validate_signal(symbol, latest_data, now_ms):
                     if (
                         latest_data["apr"] > params["entry_apr"]
                         and latest_data["rolling_apr_avg"] > params["entry_apr"]
                     ):
                         signals.append({"symbol": symbol, "current_apr": latest_data["apr"], "action": "ENTER"})
-                        print(f"  >>> Signal VALIDATED and CONFIRMED for {symbol}! <<<")
+                        logger.info("Entry signal VALIDATED and CONFIRMED for %s.", symbol)
                 else:
-                    print(f"  - Signal for {symbol} REJECTED due to failed validation.")
+                    logger.warning("Signal for %s REJECTED due to failed validation.", symbol)
 
             except Exception as e:
-                print(f"Could not process signal for {symbol}. Reason: {e}")
+                logger.warning("Could not process signal for %s. Reason: %s", symbol, e)
         return signals
 
-    def check_exit_signal(self, open_position):
-        symbol = open_position["symbol"]
+    def _fetch_histories(self, candidates):
+        """
+        Fetches (or reuses, see get_funding_rate_history) the recent funding history of every
+        (symbol, params, perp_symbol) candidate.
+
+        The requests go out one after another: the shared sync client's rate limiter isn't thread-safe, and
+        with the settlement-aware cache most scans make no request at all. Returns one history per candidate
+        in the same order, or the exception its request raised.
+        """
+        histories = []
+        for _, params, perp_symbol in candidates:
+            try:
+                histories.append(get_funding_rate_history(self.exchange, perp_symbol, params["filter_periods"] + 5))
+            except Exception as e:
+                histories.append(e)
+        return histories
+
+    def check_exit_signal(self, open_position, current_funding_rate=None):
+        """
+        Returns True when the open position's APR has fallen below its exit threshold.
+        Uses current_funding_rate when the caller has one (e.g. from a WebSocket stream),
+        otherwise the TTL-cached REST rate.
+        """
+        symbol = open_position.symbol
         params = self.optimal_params.get(symbol)
         if not params:
             return False
 
-        print(f"Checking exit condition for open position: {symbol}")
+        logger.debug("Checking exit condition for open position: %s", symbol)
         try:
-            perp_symbol = f"{symbol.split('/')[0]}/USDT:USDT"
-            rate_data = self.exchange.fetch_funding_rate(perp_symbol)
-            current_funding_rate = rate_data.get("fundingRate")
             if current_funding_rate is None:
-                return False
+                current_funding_rate = get_funding_rate(self.exchange, perp_symbol_for(symbol))
+                if current_funding_rate is None:
+                    return False
 
-            current_apr = (current_funding_rate * 3 * 365) * 100
+            current_apr = current_funding_rate * APR_PER_FUNDING_RATE
             exit_threshold = params["exit_apr"]
-            print(f"  - {symbol}: Current APR={current_apr:.2f}%, Exit Threshold={exit_threshold:.2f}%")
+            logger.debug("%s: Current APR=%.2f%%, Exit Threshold=%.2f%%", symbol, current_apr, exit_threshold)
             if current_apr < exit_threshold:
-                print(f"  >>> EXIT Signal FOUND for {symbol}! <<<")
+                logger.info("EXIT signal found for %s.", symbol)
                 return True
         except Exception as e:
-            print(f"Could not check exit signal for {symbol}. Reason: {e}")
+            logger.warning("Could not check exit signal for %s. Reason: %s", symbol, e)
         return False
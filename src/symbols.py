@@ -0,0 +1,7 @@
+import functools
+
+
+@functools.lru_cache(maxsize=128)
+def perp_symbol_for(symbol):
+    """Maps a spot symbol like 'BTC/USDT' to its USD-M perpetual, 'BTC/USDT:USDT'."""
+    return f"{symbol.split('/')[0]}/USDT:USDT"